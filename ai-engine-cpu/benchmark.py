@@ -0,0 +1,377 @@
+"""
+Latency and throughput benchmarks of the detector, OCR and the full pipeline.
+
+Every step is timed on its own: detector preprocessing, inference and NMS,
+OCR preprocessing, inference and CTC decoding, at every batch size given,
+plus frames per second of the detect, track, OCR and consensus pipeline with
+that many regions per frame, with inference in this process and in every
+given number of forked worker processes. Prints p50/p95/p99 latency, items
+per second and the peak resident memory so far, and writes the results with
+the ONNX Runtime settings and library versions as JSON for comparing commits
+and settings.
+
+Runs on the CPU provider only and never uses the optimized graph cache, so
+every run optimizes the models with the configured settings. Inputs are the
+given images, or a seeded synthetic frame with a plate in every region and a
+synthetic plate crop when none are given, see synthetic.py. Worker processes
+get the frames pickled, as with the thread-based capture.
+
+Usage:
+    python benchmark.py [--suites detector ocr pipeline] [--batch-sizes 1 2 4]
+                        [--processes 0 1 2 4]
+                        [--image data/4.png] [--plate data/RP70012.png]
+                        [--output benchmark.json]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+import onnxruntime as rt
+
+from engine.camera import Camera
+from engine.capture import Frame
+from engine.inference_pool import InferencePool, fork_safe_session_config
+from engine.pipeline import Pipeline
+from engine.pipes.number_plate_text_readers.base.ocr import Ocr
+from engine.pipes.object_detectors.base.lp import LicensePlateDetector
+from engine.stages import (
+    ConsensusStage,
+    DetectStage,
+    OcrStage,
+    TrackStage,
+    gate_frame,
+)
+from engine.tools.ocr_tools import decode_batch
+from engine.tools.synthetic import (
+    random_plate_text,
+    render_background,
+    render_plate,
+    render_scene,
+)
+from engine.tools.onnx_tools import model_session_config
+from engine.tracker import PlateTracker
+from engine.utils import load_config
+
+SUITES = ("detector", "ocr", "pipeline")
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes everywhere else
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(name, batch_size, times, items=None):
+    """
+    Latency percentiles of one benchmark.
+
+    Args:
+        times (list): Seconds per iteration.
+        items (int, optional): Items (images, crops, frames) per iteration,
+            batch_size when not given.
+    """
+    times_ms = np.asarray(times) * 1000
+    items = batch_size if items is None else items
+    return {
+        "name": name,
+        "batch_size": batch_size,
+        "iterations": len(times_ms),
+        "mean_ms": float(times_ms.mean()),
+        "p50_ms": float(np.percentile(times_ms, 50)),
+        "p95_ms": float(np.percentile(times_ms, 95)),
+        "p99_ms": float(np.percentile(times_ms, 99)),
+        "fps": float(items * 1000 / times_ms.mean()),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def time_calls(fn, iterations, warmup):
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(iterations):
+        time_start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - time_start)
+    return times
+
+
+def split_regions(frame, count):
+    """`count` side-by-side regions across the middle band of a frame."""
+    height, width = frame.shape[:2]
+    y1, y2 = height // 2, height * 3 // 4
+    edges = np.linspace(0, width, count + 1).astype(int)
+    return [(x1, y1, x2, y2) for x1, x2 in zip(edges[:-1], edges[1:])]
+
+
+def region_config(name, rect):
+    """`camera[].regions[]` config entry of an (x1, y1, x2, y2) rectangle."""
+    x1, y1, x2, y2 = rect
+    corners = [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
+    return {"name": name, "coordinates": [{"x": x, "y": y} for x, y in corners]}
+
+
+def bench_detector(net, frame, batch_sizes, args):
+    results = []
+    for batch_size in batch_sizes:
+        regions = [
+            frame[y1:y2, x1:x2] for x1, y1, x2, y2 in split_regions(frame, batch_size)
+        ]
+        xs = net.preprocess_batch(regions).copy()
+        scores, boxes = net.infer_batch(xs)
+        for name, fn in (
+            ("detector.preprocess", lambda: net.preprocess_batch(regions)),
+            ("detector.inference", lambda: net.infer_batch(xs)),
+            ("detector.nms", lambda: net.postprocess_batch(scores, boxes)),
+        ):
+            results.append(
+                summarize(
+                    name, batch_size, time_calls(fn, args.iterations, args.warmup)
+                )
+            )
+    return results
+
+
+def bench_ocr(ocr, plate, batch_sizes, args):
+    results = []
+    box = (0, 0, plate.shape[1], plate.shape[0])
+    for batch_size in batch_sizes:
+        boxes = [box] * batch_size
+        xs = ocr.preprocess_crops(plate, boxes).copy()
+        out = ocr.infer(xs)
+        for name, fn in (
+            ("ocr.preprocess", lambda: ocr.preprocess_crops(plate, boxes)),
+            ("ocr.inference", lambda: ocr.infer(xs)),
+            (
+                "ocr.decode",
+                lambda: decode_batch(out, ocr.label_converter, return_confidence=True),
+            ),
+        ):
+            results.append(
+                summarize(
+                    name, batch_size, time_calls(fn, args.iterations, args.warmup)
+                )
+            )
+    return results
+
+
+def bench_pipeline(net, ocr, frame, batch_sizes, args, processes=0):
+    """
+    Frames per second of the detect, track, OCR and consensus stages, one
+    region per batch slot.
+
+    Args:
+        net, ocr: Loaded models, or the stand-ins of an InferencePool.
+        processes (int): Worker processes behind net and ocr, 0 for none; the
+            detect and OCR stages get one thread per worker.
+    """
+    results = []
+    height, width = frame.shape[:2]
+    workers = max(processes, 1)
+    for batch_size in batch_sizes:
+        camera = Camera(
+            {
+                "id": 0,
+                "image_size": {"width": width, "height": height},
+                "regions": [
+                    region_config(f"region-{i}", rect)
+                    for i, rect in enumerate(split_regions(frame, batch_size))
+                ],
+            },
+            None,
+            tracker=PlateTracker(),
+        )
+
+        # Time from feeding a frame to it leaving the pipeline
+        times = []
+
+        def finish(job):
+            times.append(time.monotonic() - job.timestamp)
+
+        pipeline = Pipeline(
+            [
+                DetectStage(net, workers=workers),
+                TrackStage(),
+                OcrStage(ocr, workers=workers),
+                ConsensusStage(),
+            ],
+            on_exit=finish,
+        )
+        frames = args.warmup + args.iterations
+        jobs = (
+            gate_frame(camera, Frame(frame, i, time.monotonic())) for i in range(frames)
+        )
+        time_start = time.perf_counter()
+        pipeline.run(jobs)
+        elapsed = time.perf_counter() - time_start
+
+        result = summarize("pipeline.frame", batch_size, times[args.warmup :], items=1)
+        # Overlapping stages: throughput is not the inverse of the frame latency
+        result["fps"] = frames / elapsed
+        result["processes"] = processes
+        results.append(result)
+    return results
+
+
+def bench_pipeline_processes(engine_config, session_config, frame, args):
+    """bench_pipeline with every worker process count of --processes above 0."""
+    results = []
+    counts = [count for count in args.processes if count > 0]
+    if not counts:
+        return results
+    # Loaded once, every pool forks from the same single-threaded sessions
+    net, ocr = load_models(
+        engine_config,
+        lambda model: fork_safe_session_config(session_config(model)),
+    )
+    for processes in counts:
+        pool = InferencePool(net, ocr, processes)
+        pool.start()
+        try:
+            results += bench_pipeline(
+                pool.detector, pool.ocr, frame, args.batch_sizes, args, processes
+            )
+        finally:
+            pool.stop()
+    return results
+
+
+def load_models(engine_config, session_config):
+    net = LicensePlateDetector(engine_config)
+    net.load_model(engine_config["model"], session_config("detector"))
+    ocr = Ocr()
+    ocr.init_label_converter()
+    ocr.load_model(engine_config["ocr_model"], session_config("ocr"))
+    return net, ocr
+
+
+def print_results(results):
+    print(
+        f"{'benchmark':<22}{'procs':>6}{'batch':>6}{'p50 ms':>10}{'p95 ms':>10}"
+        f"{'p99 ms':>10}{'FPS':>10}{'RSS MB':>9}"
+    )
+    for r in results:
+        print(
+            f"{r['name']:<22}{r.get('processes', ''):>6}{r['batch_size']:>6}"
+            f"{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}"
+            f"{r['p99_ms']:>10.2f}{r['fps']:>10.1f}{r['peak_rss_mb']:>9.0f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--suites", nargs="+", choices=SUITES, default=list(SUITES))
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 2, 4])
+    parser.add_argument(
+        "--processes",
+        nargs="+",
+        type=int,
+        default=[0],
+        help="Inference worker processes of the pipeline suite, 0 runs inference in this process",
+    )
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--image", help="Camera frame, synthetic when not given")
+    parser.add_argument("--plate", help="Plate crop, synthetic when not given")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    engine_config = load_config(args.config)["engine"]
+    onnxruntime_config = engine_config.get("onnxruntime")
+
+    def session_config(model):
+        config = dict(
+            model_session_config(onnxruntime_config, model),
+            providers=["CPUExecutionProvider"],
+        )
+        # A cached graph would keep the settings it was optimized with
+        config.pop("optimized_model_filepath", None)
+        return config
+
+    rng = np.random.default_rng(args.seed)
+    if args.image:
+        frame = cv2.imread(args.image)
+    else:
+        width = engine_config.get("width", 1920)
+        height = engine_config.get("height", 1080)
+        background = render_background(width, height, rng)
+        regions = split_regions(background, max(args.batch_sizes))
+        frame, _ = render_scene(
+            [(f"region-{i}", rect) for i, rect in enumerate(regions)],
+            rng,
+            width,
+            height,
+            background,
+        )
+    if args.plate:
+        plate = cv2.imread(args.plate)
+    else:
+        plate = render_plate(random_plate_text(rng), rng)
+
+    net, ocr = load_models(engine_config, session_config)
+
+    results = []
+    if "detector" in args.suites:
+        results += bench_detector(net, frame, args.batch_sizes, args)
+    if "ocr" in args.suites:
+        results += bench_ocr(ocr, plate, args.batch_sizes, args)
+    if "pipeline" in args.suites:
+        if 0 in args.processes:
+            results += bench_pipeline(net, ocr, frame, args.batch_sizes, args)
+        results += bench_pipeline_processes(engine_config, session_config, frame, args)
+    print_results(results)
+
+    if args.output:
+        report = {
+            "meta": {
+                "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "machine": platform.machine(),
+                "cpu_count": os.cpu_count(),
+                "numpy": np.__version__,
+                "opencv": cv2.__version__,
+                "onnxruntime": rt.__version__,
+                "onnxruntime_config": {
+                    model: session_config(model) for model in ("detector", "ocr")
+                },
+                "inputs": {
+                    "image": args.image or f"synthetic seed {args.seed}",
+                    "plate": args.plate or f"synthetic seed {args.seed}",
+                },
+                "args": vars(args),
+            },
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
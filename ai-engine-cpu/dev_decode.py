@@ -0,0 +1,38 @@
+import time
+import numpy as np
+from engine.pipes.number_plate_text_readers.base.ocr import Ocr
+from engine.tools.ocr_tools import decode_batch, decode_prediction
+
+ocr = Ocr()
+ocr.init_label_converter()
+label_converter = ocr.label_converter
+
+rng = np.random.default_rng(0)
+N = 200
+
+print(f"{'batch':>5} {'loop [ms]':>10} {'vectorized [ms]':>16} {'speedup':>8}")
+for batch_size in [1, 2, 4, 8, 16, 32, 64]:
+    # Random logits shaped like the OCR model output: (time steps, batch, classes)
+    net_out_value = rng.normal(
+        size=(ocr.label_length, batch_size, ocr.letters_max)
+    ).astype(np.float32)
+
+    # Reference: per-plate decoding with softmax, groupby and string concatenation
+    time_start = time.perf_counter()
+    for _ in range(N):
+        expected = [
+            decode_prediction(net_out_value[:, i : i + 1, :], label_converter).upper()
+            for i in range(batch_size)
+        ]
+    loop_time = (time.perf_counter() - time_start) / N
+
+    time_start = time.perf_counter()
+    for _ in range(N):
+        texts = decode_batch(net_out_value, label_converter)
+    vectorized_time = (time.perf_counter() - time_start) / N
+
+    assert texts == expected, (texts, expected)
+    print(
+        f"{batch_size:>5} {loop_time * 1000:>10.3f} {vectorized_time * 1000:>16.3f}"
+        f" {loop_time / vectorized_time:>7.1f}x"
+    )
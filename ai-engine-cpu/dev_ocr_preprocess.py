@@ -0,0 +1,65 @@
+import time
+import cv2
+import numpy as np
+from engine.pipes.number_plate_text_readers.base.ocr import Ocr
+from engine.tools.image_processing import normalize_img
+
+ocr = Ocr()
+rng = np.random.default_rng(0)
+N = 200
+
+# Synthetic region with dark-on-light plates of typical detector box sizes
+region_img = rng.integers(60, 120, size=(720, 1280, 3), dtype=np.uint8)
+boxes = []
+for i, (w, h) in enumerate([(90, 22), (140, 34), (220, 52), (330, 80)] * 4):
+    x_min, y_min = 20 + (i % 4) * 340, 40 + (i // 4) * 170
+    plate = region_img[y_min : y_min + h, x_min : x_min + w]
+    plate[:] = rng.integers(200, 240)
+    cv2.putText(
+        plate, "LJ AB123", (4, h * 3 // 4), cv2.FONT_HERSHEY_SIMPLEX, h / 40, (20, 20, 20), 2
+    )
+    boxes.append((x_min, y_min, x_min + w, y_min + h))
+
+
+def two_step(boxes):
+    # Previous main.py path: resize to 300x100, BGR->RGB, then Ocr.preprocess
+    cropped_imgs = []
+    for x_min, y_min, x_max, y_max in boxes:
+        cropped_img = cv2.resize(region_img[y_min:y_max, x_min:x_max], (300, 100))
+        cropped_imgs.append(cv2.cvtColor(cropped_img, cv2.COLOR_BGR2RGB))
+    return ocr.preprocess(cropped_imgs)
+
+
+# The fused normalization must match cv2.normalize on the same resized image
+for x_min, y_min, x_max, y_max in boxes:
+    resized = cv2.resize(region_img[y_min:y_max, x_min:x_max], (ocr.width, ocr.height))
+    expected = normalize_img(
+        cv2.cvtColor(resized, cv2.COLOR_BGR2RGB), height=ocr.height, width=ocr.width
+    )
+    expected = np.moveaxis(expected, 2, 0)
+    fused = ocr.preprocess_crops(region_img, [(x_min, y_min, x_max, y_max)])[0]
+    np.testing.assert_allclose(fused, expected, atol=1e-6)
+
+# Against the old double resize only interpolation differs
+diff = np.abs(ocr.preprocess_crops(region_img, boxes) - two_step(boxes))
+print(f"fused vs two-step: mean abs diff {diff.mean():.4f}, max {diff.max():.4f}")
+assert diff.mean() < 0.02, diff.mean()
+
+print(f"{'plates':>6} {'two-step [us/plate]':>20} {'fused [us/plate]':>17} {'speedup':>8}")
+for n in [1, 4, 16]:
+    batch = boxes[:n]
+
+    time_start = time.perf_counter()
+    for _ in range(N):
+        two_step(batch)
+    two_step_time = (time.perf_counter() - time_start) / N / n
+
+    time_start = time.perf_counter()
+    for _ in range(N):
+        ocr.preprocess_crops(region_img, batch)
+    fused_time = (time.perf_counter() - time_start) / N / n
+
+    print(
+        f"{n:>6} {two_step_time * 1e6:>20.1f} {fused_time * 1e6:>17.1f}"
+        f" {two_step_time / fused_time:>7.1f}x"
+    )
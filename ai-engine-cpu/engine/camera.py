@@ -0,0 +1,109 @@
+import numpy as np
+
+
+class Region:
+    """
+    Rectangular region of interest inside a camera frame.
+
+    Args:
+        name (str): Region name, e.g. "entry_region".
+        x1, y1 (int): Top-left corner in image_size coordinates.
+        x2, y2 (int): Bottom-right corner in image_size coordinates.
+    """
+
+    __slots__ = ("name", "x1", "y1", "x2", "y2")
+
+    def __init__(self, name, x1, y1, x2, y2):
+        self.name = name
+        self.x1 = x1
+        self.y1 = y1
+        self.x2 = x2
+        self.y2 = y2
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Build a region from a `camera[].regions[]` config entry.
+
+        The first coordinate is the top-left and the third the bottom-right corner.
+        """
+        coords = config["coordinates"]
+        return cls(
+            config["name"], coords[0]["x"], coords[0]["y"], coords[2]["x"], coords[2]["y"]
+        )
+
+
+class Camera:
+    """
+    One entry of the `camera:` config list together with its capture worker.
+
+    Args:
+        config (dict): The camera config entry.
+        grabber: Capture worker delivering frames for this camera.
+        tracker (PlateTracker, optional): Tracker following the plates of this camera.
+
+    Attributes:
+        region_rects, region_origins, region_sizes (np.ndarray): int32 region
+            geometry in the native stream resolution, see update_resolution.
+        motion_gates (list | None): One MotionGate per region, None when every
+            region is checked on every frame.
+    """
+
+    def __init__(self, config, grabber, tracker=None):
+        self.config = config
+        self.id = config.get("id")
+        self.width = config["image_size"]["width"]
+        self.height = config["image_size"]["height"]
+        self.regions = [Region.from_config(region) for region in config["regions"]]
+        self.grabber = grabber
+        self.tracker = tracker
+        self.motion_gates = None
+
+        # Region geometry in the stream's native resolution, see update_resolution
+        self.frame_size = None
+        self.region_rects = None
+        self.region_origins = None
+        self.region_sizes = None
+        self.update_resolution(self.width, self.height)
+
+    @classmethod
+    def whole_frame(cls, width, height, tracker=None):
+        """Camera without a grabber whose only region is the whole frame, for offline runs."""
+        corners = [(0, 0), (width, 0), (width, height), (0, height)]
+        config = {
+            "id": 0,
+            "image_size": {"width": width, "height": height},
+            "regions": [
+                {"name": "frame", "coordinates": [{"x": x, "y": y} for x, y in corners]}
+            ],
+        }
+        return cls(config, None, tracker=tracker)
+
+    def update_resolution(self, frame_width, frame_height):
+        """
+        Map the regions from image_size coordinates to the stream's native resolution.
+
+        Recomputes region_rects ((x1, y1, x2, y2) per region), region_origins
+        ((x, y)) and region_sizes ((width, height)) only when the resolution
+        changes, so frames can be cropped without resizing them to image_size.
+
+        Args:
+            frame_width (int): Width of the decoded frames.
+            frame_height (int): Height of the decoded frames.
+        """
+        if self.frame_size == (frame_width, frame_height):
+            return
+        scale = np.array(
+            [frame_width / self.width, frame_height / self.height] * 2
+        )
+        rects = np.array(
+            [(region.x1, region.y1, region.x2, region.y2) for region in self.regions],
+            dtype=np.float64,
+        ).reshape(-1, 4)
+        rects = np.round(rects * scale).astype(np.int32)
+        np.clip(rects, 0, [frame_width, frame_height] * 2, out=rects)
+
+        self.frame_size = (frame_width, frame_height)
+        self.region_rects = rects
+        self.region_origins = rects[:, :2]
+        self.region_sizes = rects[:, 2:] - rects[:, :2]
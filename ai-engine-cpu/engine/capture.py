@@ -0,0 +1,259 @@
+import logging
+import threading
+import time
+
+import cv2
+
+
+class FramePool:
+    """
+    Reusable frame buffers shared by a capture thread and its consumer.
+
+    The capture thread decodes into a free buffer, the newest frame holds one
+    and the consumer holds one while it works on it, so three buffers cover
+    latest-frame-wins capture without allocating per frame. When all buffers
+    are taken the capture thread decodes into a fresh array instead of waiting;
+    buffers beyond `size` are dropped when they are released.
+
+    Args:
+        size (int): Number of buffers kept for reuse.
+    """
+
+    def __init__(self, size=3):
+        self.size = size
+        self._free = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Return a free buffer, or None when there is none."""
+        with self._lock:
+            return self._free.pop() if self._free else None
+
+    def release(self, buffer):
+        """Return a buffer to the pool."""
+        with self._lock:
+            if len(self._free) < self.size:
+                self._free.append(buffer)
+
+
+class Frame:
+    """
+    A decoded camera frame handed from the capture thread to the inference loop.
+
+    The image lives in a buffer of the grabber's FramePool. Reading the frame
+    hands the buffer over to the consumer, which gives it back with release()
+    once it no longer uses the image (or any view of it).
+
+    Attributes:
+        image (np.ndarray): BGR image as returned by cv2.VideoCapture.
+        seq (int): Monotonic sequence number of the frame within its stream.
+        timestamp (float): time.monotonic() value taken right after decoding.
+        shared (tuple): (shared memory name, frame shape, slots, slot) of a frame
+            in a FrameRingBuffer, which other processes can map; None for
+            frames in the memory of this process.
+    """
+
+    __slots__ = ("image", "seq", "timestamp", "shared", "_pool")
+
+    def __init__(self, image, seq, timestamp, pool=None, shared=None):
+        self.image = image
+        self.seq = seq
+        self.timestamp = timestamp
+        self.shared = shared
+        self._pool = pool
+
+    def release(self):
+        """Give the image buffer back for reuse; the image must not be used afterwards."""
+        if self._pool is not None:
+            self._pool.release(self.image)
+            self._pool = None
+            # The buffer may be overwritten or unmapped from now on
+            self.image = None
+
+    @property
+    def age(self):
+        """Seconds elapsed between decoding the frame and now."""
+        return time.monotonic() - self.timestamp
+
+
+class FrameGrabber:
+    """
+    Background capture worker with latest-frame-wins semantics.
+
+    A dedicated thread keeps decoding the stream as fast as the camera delivers
+    frames and only keeps the newest one. Frames that are overwritten before the
+    consumer picks them up are counted as dropped, so the inference loop never
+    works on a backlog of stale frames, regardless of how slow inference is.
+
+    Args:
+        source (str | int): Anything accepted by cv2.VideoCapture.
+        name (str): Name used in log messages.
+        max_retries (int): Consecutive reconnect attempts before giving up.
+        retry_delay (float): Delay between reconnect attempts (in seconds).
+        notify (threading.Event, optional): Set whenever a new frame arrives or the
+            worker fails. Lets one consumer wait on several grabbers at once.
+        pool_size (int): Frame buffers kept for reuse, see FramePool.
+    """
+
+    def __init__(
+        self,
+        source,
+        name="camera",
+        max_retries=5,
+        retry_delay=5,
+        notify=None,
+        pool_size=3,
+    ):
+        self.source = source
+        self.name = name
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.notify = notify
+
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.reconnects = 0
+        # Frame arrays the decoder had to allocate because no pooled buffer fit
+        self.buffers_allocated = 0
+        self.error = None
+
+        self.pool = FramePool(pool_size)
+
+        self._stream = None
+        self._latest = None
+        self._last_seq = -1
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    @property
+    def failed(self):
+        """True when the worker gave up after exceeding max_retries."""
+        return self.error is not None
+
+    def open(self):
+        """
+        Open the video source.
+
+        Raises:
+            ConnectionError: If the source can not be opened.
+        """
+        stream = cv2.VideoCapture(self.source)
+        if not stream.isOpened():
+            raise ConnectionError(f"Could not open video source: {self.source}")
+        # Keep the decoder-side queue as short as the backend allows
+        stream.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self._stream = stream
+
+    def start(self):
+        """
+        Open the source (if needed) and start the capture thread.
+
+        Returns:
+            FrameGrabber: self, for chaining.
+        """
+        if self._stream is None:
+            self.open()
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._run, name=f"capture-{self.name}", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the capture thread and release the video source."""
+        self._running = False
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=self.retry_delay + 1)
+        if self._stream is not None:
+            self._stream.release()
+            self._stream = None
+
+    def read(self, timeout=None):
+        """
+        Return the newest frame that has not been returned yet.
+
+        The caller owns the returned frame and calls Frame.release() when done.
+
+        Args:
+            timeout (float, optional): Seconds to wait for a new frame. None waits forever.
+
+        Returns:
+            Frame | None: The newest frame, or None on timeout, stop or failure.
+        """
+        with self._condition:
+            if not self._has_new_frame():
+                self._condition.wait_for(
+                    lambda: self._has_new_frame() or not self._running or self.failed,
+                    timeout=timeout,
+                )
+            if not self._has_new_frame():
+                return None
+            frame = self._latest
+            self._last_seq = frame.seq
+            return frame
+
+    def _has_new_frame(self):
+        return self._latest is not None and self._latest.seq > self._last_seq
+
+    def _reconnect(self, retries):
+        if self._stream is not None:
+            self._stream.release()
+            self._stream = None
+        if retries > self.max_retries:
+            self.error = ConnectionError(
+                f"Failed to capture frame from stream {self.name} after {retries} attempts"
+            )
+            return False
+        time.sleep(self.retry_delay)  # Short delay before the next attempt
+        logging.warning(f"[CAP] Attempting to reconnect to stream {self.name}...")
+        try:
+            self.open()
+            self.reconnects += 1
+        except ConnectionError as e:
+            logging.error(f"[CAP] {e}")
+        return True
+
+    def _run(self):
+        seq = 0
+        retries = 0
+        while self._running:
+            ret = False
+            buffer = self.pool.acquire()
+            if self._stream is not None:
+                # Decode into the pooled buffer; OpenCV allocates a new array
+                # when there is none or its shape no longer matches the stream
+                ret, image = self._stream.read(image=buffer)
+            if not ret:
+                if buffer is not None:
+                    self.pool.release(buffer)
+                logging.error(f"[CAP] Failed to capture frame from stream {self.name}.")
+                retries += 1
+                if not self._reconnect(retries):
+                    break
+                continue
+            retries = 0  # Reset counter on success
+            if image is not buffer:
+                # No free buffer, or the resolution changed and the old one is dropped
+                self.buffers_allocated += 1
+
+            frame = Frame(image, seq, time.monotonic(), self.pool)
+            seq += 1
+            with self._condition:
+                if self._has_new_frame():
+                    # Previous frame was never consumed, its buffer is free again
+                    self.frames_dropped += 1
+                    self._latest.release()
+                self._latest = frame
+                self.frames_captured += 1
+                self._condition.notify_all()
+            if self.notify is not None:
+                self.notify.set()
+
+        with self._condition:
+            self._condition.notify_all()
+        if self.notify is not None:
+            self.notify.set()
@@ -0,0 +1,86 @@
+import collections
+
+import numpy as np
+
+
+class PlateConsensus:
+    """
+    Character-position vote over several OCR reads of the same plate.
+
+    Reads first vote on the plate length, weighted by their mean character
+    confidence. The reads of the winning length then vote on every character
+    position, each character weighted by its decoder confidence. The agreement
+    is the share of weight behind the winning length times the weakest share
+    behind a winning character, so one uncertain position holds back the result.
+
+    Args:
+        min_reads (int): Reads needed before the result can be final.
+        min_agreement (float): Agreement (0-1) needed for a final result.
+        max_reads (int): Only the most recent reads take part in the vote.
+    """
+
+    def __init__(self, min_reads=2, min_agreement=0.6, max_reads=10):
+        self.min_reads = min_reads
+        self.min_agreement = min_agreement
+        self.reads = collections.deque(maxlen=max_reads)
+
+        self.text = ""
+        self.agreement = 0.0
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a consensus from the optional `engine.consensus` config section."""
+        config = config or {}
+        return cls(
+            min_reads=config.get("min_reads", 2),
+            min_agreement=config.get("min_agreement", 0.6),
+            max_reads=config.get("max_reads", 10),
+        )
+
+    @property
+    def final(self):
+        """True once enough reads agree on the plate."""
+        return len(self.reads) >= self.min_reads and self.agreement >= self.min_agreement
+
+    def add(self, text, char_confidences):
+        """
+        Add one read and update the vote.
+
+        Args:
+            text (str): Plate text; empty reads are ignored.
+            char_confidences (np.ndarray): Decoder confidence of every character of `text`.
+
+        Returns:
+            str: The current consensus text.
+        """
+        if text:
+            self.reads.append((text, np.asarray(char_confidences, dtype=np.float32)))
+            self._vote()
+        return self.text
+
+    def _vote(self):
+        length_weights = collections.defaultdict(float)
+        for text, confidences in self.reads:
+            length_weights[len(text)] += float(confidences.mean())
+        length = max(length_weights, key=length_weights.get)
+        total_weight = sum(length_weights.values())
+
+        reads = [read for read in self.reads if len(read[0]) == length]
+        chars = np.frombuffer(
+            "".join(text for text, _ in reads).encode("ascii"), dtype=np.uint8
+        ).reshape(len(reads), length)
+        weights = np.stack([confidences for _, confidences in reads])
+
+        # Summed confidence of every byte value at every position, shape (length, 256)
+        scores = np.zeros((length, 256), dtype=np.float32)
+        positions = np.broadcast_to(np.arange(length), chars.shape)
+        np.add.at(scores, (positions, chars), weights)
+
+        winners = scores.argmax(axis=1).astype(np.uint8)
+        position_weights = scores.sum(axis=1)
+        position_shares = scores.max(axis=1) / np.maximum(position_weights, 1e-6)
+
+        self.text = winners.tobytes().decode("ascii")
+        self.agreement = float(
+            length_weights[length] / max(total_weight, 1e-6) * position_shares.min()
+        )
@@ -0,0 +1,237 @@
+import logging
+import multiprocessing as mp
+import queue
+import signal
+from multiprocessing import resource_tracker
+
+import numpy as np
+
+from engine.shared_capture import FrameRingBuffer
+
+
+def fork_safe_session_config(config):
+    """
+    Session settings for models that will be used from forked workers.
+
+    ONNX Runtime's thread pools do not survive fork, so every session runs on
+    the calling thread and the worker processes provide the parallelism.
+    """
+    config = dict(config or {})
+    config["intra_op_num_threads"] = 1
+    config["inter_op_num_threads"] = 1
+    config["execution_mode"] = "sequential"
+    return config
+
+
+def _map_frame(rings, shared, seq):
+    """Image of a frame in a FrameRingBuffer, attaching to the ring on first use."""
+    name, shape, slots, slot = shared
+    ring = rings.get(name)
+    if ring is None:
+        # Only the frames are read, the header lock is not needed
+        ring = rings[name] = FrameRingBuffer.attach(name, shape, slots, None)
+    if ring.seqs[slot] != seq:
+        raise RuntimeError(f"Slot {slot} of {name} no longer holds frame {seq}")
+    return ring.frames[slot]
+
+
+def _worker(conn, net, ocr):
+    # The parent handles Ctrl+C and stops the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    rings = {}
+
+    def detect_shared(shared, seq, rects):
+        image = _map_frame(rings, shared, seq)
+        return net.detect([image[y1:y2, x1:x2] for x1, y1, x2, y2 in rects])
+
+    def read_shared(shared, seq, boxes):
+        return ocr.read(_map_frame(rings, shared, seq), boxes)
+
+    tasks = {
+        "detect": net.detect,
+        "read": ocr.read,
+        "detect_shared": detect_shared,
+        "read_shared": read_shared,
+    }
+    while True:
+        try:
+            task, args = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if task is None:
+            break
+        try:
+            conn.send((True, tasks[task](*args)))
+        except Exception as e:
+            conn.send((False, f"{type(e).__name__}: {e}"))
+    conn.close()
+
+
+class InferencePool:
+    """
+    Detector and OCR inference in forked worker processes.
+
+    The workers are forked once the models are loaded, so they share the
+    weights with the parent copy-on-write, and run preprocessing, inference and
+    post-processing outside the parent's GIL. A call blocks the calling thread
+    until an idle worker returned the result; pipeline stages with one thread
+    per worker keep all of them busy, and ordered stages put the results back
+    into frame order.
+
+    Frames from a ProcessFrameGrabber are not sent to the workers: they get
+    the ring buffer slot and map the frame from shared memory themselves.
+    Frames of the thread-based FrameGrabber are pickled, only the region
+    crops and the part of the frame covering the plates.
+
+    Start the pool before any other thread of the process: a fork copies locks
+    held by other threads, and the children would wait on them forever. The
+    logging thread is the exception, it pauses during a fork and children
+    log without it, see logger.logger. For the same reason a worker that dies is not forked
+    again: the pool fails, every later call raises, and `failed` tells the
+    engine to exit so its supervisor restarts it.
+
+    Args:
+        net (LicensePlateDetector): Loaded detector, see fork_safe_session_config.
+        ocr (Ocr): Loaded OCR model, see fork_safe_session_config.
+        processes (int): Number of worker processes.
+
+    Attributes:
+        detector, ocr: Stand-ins for the models with the detect/read/clone
+            methods used by DetectStage and OcrStage.
+        error (Exception): Why the pool failed, None while it works.
+    """
+
+    def __init__(self, net, ocr, processes):
+        if processes < 1:
+            raise ValueError("An inference pool needs at least one process")
+        self.net = net
+        self.ocr_model = ocr
+        self.processes = processes
+        self.detector = _PoolDetector(self)
+        self.ocr = _PoolOcr(self)
+
+        self.error = None
+
+        self._workers = []
+        self._idle = queue.Queue()
+
+    @property
+    def failed(self):
+        """True once a worker process died."""
+        return self.error is not None
+
+    def start(self):
+        """Fork the worker processes."""
+        # Share one resource tracker with the capture processes, so a worker
+        # mapping a ring buffer never has it unlinked when the worker exits
+        resource_tracker.ensure_running()
+        context = mp.get_context("fork")
+        for index in range(self.processes):
+            conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=_worker,
+                args=(child_conn, self.net, self.ocr_model),
+                name=f"inference-{index}",
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+            self._workers.append((process, conn))
+            self._idle.put((process, conn))
+        logging.info(f"[POOL] Started {self.processes} inference workers")
+
+    def stop(self):
+        """Stop the worker processes; calls still running fail."""
+        for process, conn in self._workers:
+            try:
+                conn.send((None, None))
+            except (BrokenPipeError, OSError):
+                pass
+        for process, conn in self._workers:
+            process.join(timeout=2)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+            conn.close()
+        self._workers = []
+
+    @property
+    def alive(self):
+        """Number of worker processes still running."""
+        return sum(process.is_alive() for process, _ in self._workers)
+
+    def call(self, task, *args):
+        """
+        Run `task` on an idle worker and return its result.
+
+        Raises:
+            RuntimeError: If the task failed, or the pool failed.
+        """
+        while True:
+            if self.error is not None:
+                raise RuntimeError(f"Inference pool failed: {self.error}")
+            try:
+                process, conn = self._idle.get(timeout=1.0)
+                break
+            except queue.Empty:
+                if not self.alive:
+                    self._fail(RuntimeError("No inference worker left"))
+        try:
+            conn.send((task, args))
+            ok, result = conn.recv()
+        except (EOFError, BrokenPipeError, OSError) as e:
+            # The worker died; it is not handed out again
+            self._fail(RuntimeError(f"Inference worker {process.name} died: {e!r}"))
+        self._idle.put((process, conn))
+        if not ok:
+            raise RuntimeError(result)
+        return result
+
+    def _fail(self, error):
+        if self.error is None:
+            logging.critical(f"[POOL] {error}, the inference pool is no longer usable")
+            self.error = error
+        raise self.error
+
+
+class _PoolDetector:
+    # DetectStage passes the frame and region rectangles along with the crops
+    takes_frame = True
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def clone(self):
+        return self
+
+    def detect(self, imgs, frame=None, rects=None):
+        if frame is not None and frame.shared is not None:
+            return self.pool.call(
+                "detect_shared", frame.shared, frame.seq, np.asarray(rects).tolist()
+            )
+        # Region crops are views into the frame; pickling copies just the crops
+        return self.pool.call("detect", list(imgs))
+
+
+class _PoolOcr:
+    # OcrStage passes the frame along with its image
+    takes_frame = True
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def clone(self):
+        return self
+
+    def read(self, img, boxes, frame=None):
+        boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+        if not len(boxes):
+            return [], [], np.empty(0, dtype=np.float32)
+        if frame is not None and frame.shared is not None:
+            return self.pool.call("read_shared", frame.shared, frame.seq, boxes.tolist())
+        # Send only the part of the frame covering the plates
+        x_min, y_min = boxes[:, :2].min(axis=0)
+        x_max, y_max = boxes[:, 2:].max(axis=0)
+        crop = img[y_min:y_max, x_min:x_max]
+        boxes = boxes - np.array([x_min, y_min, x_min, y_min], dtype=np.int32)
+        return self.pool.call("read", crop, boxes.tolist())
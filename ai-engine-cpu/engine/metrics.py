@@ -0,0 +1,379 @@
+import bisect
+import logging
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency buckets in seconds, from sub-millisecond preprocessing to slow frames
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n"))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Base of the metric types: one child per combination of label values."""
+
+    type = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """Child metric for the given label values, created on first use."""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.label_names):
+                raise ValueError(f"{self.name} expects labels {self.label_names}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _default(self):
+        # Metrics without labels record into their only child
+        if self.label_names:
+            raise ValueError(f"{self.name} needs labels {self.label_names}")
+        return self.labels()
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        for key, child in list(self._children.items()):
+            lines.extend(child.render(self.name, self.label_names, key))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def render(self, name, label_names, key):
+        return [f"{name}{_format_labels(label_names, key)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    """Monotonic count, e.g. processed frames."""
+
+    type = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One count per bucket plus the +Inf bucket, not cumulative
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def render(self, name, label_names, key):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            labels = _format_labels(label_names, key, [("le", _format_value(bound))])
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+        labels = _format_labels(label_names, key)
+        lines.append(f"{name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{name}_count{labels} {cumulative}")
+        return lines
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values over fixed buckets, e.g. stage latencies.
+
+    Observing is a binary search and an increment, the cumulative bucket
+    counts are only built when the metrics are scraped.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(float(bound) for bound in sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+
+class _CallbackMetric:
+    """Metric whose values are read from other objects when scraped."""
+
+    def __init__(self, name, documentation, type, labels, callback):
+        self.name = name
+        self.documentation = documentation
+        self.type = type
+        self.label_names = tuple(labels)
+        self.callback = callback
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        for key, value in self.callback().items():
+            key = key if isinstance(key, tuple) else (key,)
+            labels = _format_labels(self.label_names, [str(k) for k in key])
+            lines.append(f"{self.name}{labels} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, documentation, labels=()):
+        return self._add(Counter(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, documentation, labels, buckets))
+
+    def callback(self, name, documentation, type, labels, callback):
+        """
+        Register values kept elsewhere, e.g. the counters of a FrameGrabber.
+
+        Args:
+            type (str): "counter" or "gauge".
+            labels (tuple): Label names.
+            callback (callable): Returns {label values: value}; a single label
+                value may be given without a tuple.
+        """
+        return self._add(_CallbackMetric(name, documentation, type, labels, callback))
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                logging.error(f"[METRICS] Rendering {metric.name} failed: {e}")
+        return "\n".join(lines) + "\n"
+
+
+class EngineMetrics:
+    """
+    The metrics of the inference engine.
+
+    Args:
+        registry (Registry): Registry the metrics are added to.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.capture_latency = registry.histogram(
+            "alpr_capture_latency_seconds",
+            "Time from decoding a frame to the inference loop picking it up.",
+            labels=("camera",),
+        )
+        self.stage_latency = registry.histogram(
+            "alpr_stage_latency_seconds",
+            "Time spent in a processing stage per frame.",
+            labels=("stage",),
+        )
+        self.frame_latency = registry.histogram(
+            "alpr_frame_latency_seconds",
+            "Time from decoding a frame to the frame leaving the pipeline.",
+        )
+        self.frames = registry.counter(
+            "alpr_frames_total",
+            "Frames taken from the capture workers.",
+            labels=("camera",),
+        )
+        self.frames_skipped = registry.counter(
+            "alpr_frames_skipped_total",
+            "Frames without motion in any region, skipped before detection.",
+            labels=("camera",),
+        )
+        self.detections = registry.counter(
+            "alpr_detections_total", "Detected plates.", labels=("camera",)
+        )
+        self.reads = registry.counter(
+            "alpr_plate_reads_total", "Plates read by OCR.", labels=("camera",)
+        )
+
+    def watch_grabbers(self, cameras):
+        """Expose the capture counters of the cameras' grabbers."""
+        for name, attribute, documentation in (
+            ("alpr_capture_frames_total", "frames_captured", "Frames decoded."),
+            (
+                "alpr_capture_dropped_frames_total",
+                "frames_dropped",
+                "Frames replaced by a newer one before they were processed.",
+            ),
+            (
+                "alpr_capture_reconnects_total",
+                "reconnects",
+                "Successful reconnects to a camera stream.",
+            ),
+        ):
+            self.registry.callback(
+                name,
+                documentation,
+                "counter",
+                ("camera",),
+                lambda attribute=attribute: {
+                    camera.id: getattr(camera.grabber, attribute) for camera in cameras
+                },
+            )
+
+    def watch_mqtt(self, mqtt_engine):
+        """Expose the publish failures and the outbox of an MQTTEngine."""
+        outbox = mqtt_engine.outbox
+        for name, type, documentation, value in (
+            (
+                "alpr_mqtt_publish_failures_total",
+                "counter",
+                "Messages the MQTT client did not accept for sending.",
+                lambda: mqtt_engine.publish_failures,
+            ),
+            (
+                "alpr_mqtt_connected",
+                "gauge",
+                "1 while connected to the broker.",
+                lambda: int(mqtt_engine.connected),
+            ),
+            (
+                "alpr_mqtt_outbox_messages",
+                "gauge",
+                "Messages waiting for the broker.",
+                lambda: len(outbox),
+            ),
+            (
+                "alpr_mqtt_outbox_dropped_total",
+                "counter",
+                "Messages dropped because the outbox was full.",
+                lambda: outbox.dropped,
+            ),
+            (
+                "alpr_mqtt_outbox_expired_total",
+                "counter",
+                "Queued messages discarded after their topic's TTL.",
+                lambda: outbox.expired,
+            ),
+        ):
+            self.registry.callback(
+                name, documentation, type, (), lambda value=value: {(): value()}
+            )
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes are not worth a log line each
+        pass
+
+
+class MetricsServer:
+    """
+    Serves a Registry at /metrics from a background thread.
+
+    Args:
+        registry (Registry): Metrics to serve.
+        host (str): Address to bind, localhost by default.
+        port (int): TCP port.
+    """
+
+    def __init__(self, registry, host="127.0.0.1", port=9100):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), _MetricsHandler)
+        self._server.daemon_threads = True
+        self._server.registry = self.registry
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="metrics", daemon=True
+        )
+        self._thread.start()
+        logging.info(
+            f"[METRICS] Serving metrics on http://{self.host}:{self._server.server_port}/metrics"
+        )
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
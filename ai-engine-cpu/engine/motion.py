@@ -0,0 +1,95 @@
+import math
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Cheap change detector deciding whether a region needs plate detection.
+
+    The region crop is downscaled to a small blurred grayscale image and
+    compared with the one of the previous frame. Detection runs while the share
+    of changed pixels is above min_changed, for `hold` seconds after the last
+    motion and at least every keep_alive seconds on a static region.
+
+    Args:
+        width (int): Width the region is downscaled to before differencing.
+        pixel_threshold (int): Gray-level difference that counts a pixel as changed.
+        min_changed (float): Share (0-1) of changed pixels that counts as motion.
+        hold (float): Seconds detection keeps running after the last motion.
+        keep_alive (float): Seconds between detections on a static region.
+    """
+
+    def __init__(
+        self, width=96, pixel_threshold=12, min_changed=0.005, hold=1.0, keep_alive=5.0
+    ):
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed
+        self.hold = hold
+        self.keep_alive = keep_alive
+
+        self.frames_checked = 0
+        self.frames_skipped = 0
+
+        self._reference = None
+        self._last_motion = -math.inf
+        self._last_run = -math.inf
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a gate from the `engine.motion` config section."""
+        return cls(
+            width=config.get("width", 96),
+            pixel_threshold=config.get("pixel_threshold", 12),
+            min_changed=config.get("min_changed", 0.005),
+            hold=config.get("hold", 1.0),
+            keep_alive=config.get("keep_alive", 5.0),
+        )
+
+    def _downscale(self, img):
+        height = max(1, round(self.width * img.shape[0] / img.shape[1]))
+        # INTER_AREA is far slower at non-integer factors; the blur below evens out
+        # the sampling noise of a plain linear resize
+        small = cv2.resize(img, (self.width, height), interpolation=cv2.INTER_LINEAR)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (3, 3), 0)
+
+    def has_motion(self, img):
+        """Compare `img` with the previous frame's region and keep it as the new reference."""
+        small = self._downscale(img)
+        reference, self._reference = self._reference, small
+        if reference is None or reference.shape != small.shape:
+            return True
+        changed = np.count_nonzero(cv2.absdiff(small, reference) > self.pixel_threshold)
+        return changed >= self.min_changed * small.size
+
+    def update(self, img, timestamp, force=False):
+        """
+        Check a new region crop.
+
+        Args:
+            img (np.ndarray): BGR region crop of the current frame.
+            timestamp (float): Capture time of the frame.
+            force (bool): Run detection regardless of motion, e.g. while a plate
+                in the region still needs reads.
+
+        Returns:
+            bool: True when detection should run on the region.
+        """
+        self.frames_checked += 1
+        if self.has_motion(img):
+            self._last_motion = timestamp
+
+        run = (
+            force
+            or timestamp - self._last_motion < self.hold
+            or timestamp - self._last_run >= self.keep_alive
+        )
+        if run:
+            self._last_run = timestamp
+        else:
+            self.frames_skipped += 1
+        return run
@@ -0,0 +1,264 @@
+import logging
+import queue
+import threading
+import time
+
+# Queue entry telling a worker to exit
+_STOP = object()
+
+
+class Stage:
+    """
+    One step of a Pipeline.
+
+    Subclasses implement process(), which gets an item from the previous stage
+    and returns the item for the next one, or None to drop it. Stages with more
+    than one worker must not keep per-item state on the stage itself; several
+    workers only pay off when process() releases the GIL, as ONNX Runtime
+    inference and most OpenCV calls do.
+
+    Args:
+        name (str): Stage name used in logs and stats.
+        workers (int): Threads running process() concurrently.
+        queue_size (int): Items waiting in front of the stage. When the queue is
+            full the previous stage blocks, so a slow stage holds back the input
+            instead of letting items pile up.
+        ordered (bool): Hand items on in the order they arrived, even when
+            several workers finish them out of order.
+
+    Attributes:
+        processed (int): Items process() was called with.
+        dropped (int): Items process() returned None for or failed on.
+        busy (float): Seconds spent in process(), summed over all workers.
+    """
+
+    def __init__(self, name, workers=1, queue_size=1, ordered=True):
+        if workers < 1:
+            raise ValueError(f"Stage {name} needs at least one worker")
+        self.name = name
+        self.workers = workers
+        self.queue_size = queue_size
+        self.ordered = ordered
+
+        self.processed = 0
+        self.dropped = 0
+        self.busy = 0.0
+
+    def process(self, item):
+        raise NotImplementedError
+
+    def close(self):
+        """Called once after the last item went through the stage."""
+
+
+class FunctionStage(Stage):
+    """Stage running a plain callable, e.g. for quick experiments and dev scripts."""
+
+    def __init__(self, name, fn, workers=1, queue_size=1, ordered=True):
+        super().__init__(name, workers=workers, queue_size=queue_size, ordered=ordered)
+        self.fn = fn
+
+    def process(self, item):
+        return self.fn(item)
+
+
+class _StageRunner:
+    """Input queue, worker threads and reorder buffer of one stage."""
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.inbox = queue.Queue(maxsize=stage.queue_size)
+        self.threads = []
+        self.lock = threading.Lock()
+        # Input sequence number handed on next, and results finished ahead of it
+        self.next_in = 0
+        self.pending = {}
+        # Sequence number of the next item put into the following stage
+        self.next_out = 0
+        self.running = 0
+
+
+class Pipeline:
+    """
+    Stages joined by bounded queues, each served by its own worker threads.
+
+    Items put into the pipeline go through the stages in order, while
+    different items are in different stages at the same time: the detector
+    works on frame N+1 while OCR reads the plates of frame N. Every item leaves
+    the pipeline exactly once through on_exit, either after the last stage or
+    when a stage drops it, so resources held by an item (e.g. a frame buffer)
+    can be released in one place.
+
+    Args:
+        stages (list): Stage instances, in processing order.
+        on_exit (callable, optional): Called with every item leaving the
+            pipeline, from the worker thread that finished with it.
+        stage_latency (Histogram, optional): Observes the process() time of
+            every item, labelled with the stage name.
+
+    Usage:
+        with Pipeline([DetectStage(net), OcrStage(ocr)], on_exit=done) as pipeline:
+            for item in items:
+                pipeline.put(item)
+    """
+
+    def __init__(self, stages, on_exit=None, stage_latency=None):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.stages = list(stages)
+        self.on_exit = on_exit
+        self.stage_latency = stage_latency
+        self._runners = [_StageRunner(stage) for stage in self.stages]
+        # Sequence number of the next item put into the first stage
+        self._next_seq = 0
+        self._started = False
+        self._closed = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def start(self):
+        """Start the worker threads of every stage."""
+        if self._started:
+            return
+        self._started = True
+        for index, runner in enumerate(self._runners):
+            runner.running = runner.stage.workers
+            for worker in range(runner.stage.workers):
+                thread = threading.Thread(
+                    target=self._work,
+                    args=(index,),
+                    name=f"pipeline-{runner.stage.name}-{worker}",
+                    daemon=True,
+                )
+                runner.threads.append(thread)
+                thread.start()
+
+    def put(self, item, timeout=None):
+        """
+        Feed an item into the first stage; call from a single thread.
+
+        Blocks while the first stage's queue is full.
+
+        Returns:
+            bool: False when the queue stayed full for `timeout` seconds and the
+            item was not taken.
+        """
+        try:
+            self._runners[0].inbox.put((self._next_seq, item), timeout=timeout)
+        except queue.Full:
+            return False
+        self._next_seq += 1
+        return True
+
+    def run(self, items):
+        """Push every item of an iterable through the pipeline and wait until all left it."""
+        self.start()
+        try:
+            for item in items:
+                self.put(item)
+        finally:
+            self.close()
+
+    def close(self):
+        """Wait until the queued items went through all stages, then stop the workers."""
+        if self._closed or not self._started:
+            return
+        self._closed = True
+        first = self._runners[0]
+        for _ in range(first.stage.workers):
+            first.inbox.put(_STOP)
+        for runner in self._runners:
+            for thread in runner.threads:
+                thread.join()
+
+    def stats(self):
+        """Per-stage counters: processed and dropped items, busy seconds and queue length."""
+        return {
+            runner.stage.name: {
+                "processed": runner.stage.processed,
+                "dropped": runner.stage.dropped,
+                "busy": runner.stage.busy,
+                "queued": runner.inbox.qsize(),
+            }
+            for runner in self._runners
+        }
+
+    def _work(self, index):
+        runner = self._runners[index]
+        stage = runner.stage
+        while True:
+            entry = runner.inbox.get()
+            if entry is _STOP:
+                break
+            seq, item = entry
+
+            time_start = time.perf_counter()
+            try:
+                result = stage.process(item)
+            except Exception as e:
+                logging.error(f"[PIPE] Stage {stage.name} failed: {e}")
+                result = None
+            elapsed = time.perf_counter() - time_start
+            if self.stage_latency is not None:
+                self.stage_latency.labels(stage.name).observe(elapsed)
+
+            with runner.lock:
+                stage.processed += 1
+                stage.busy += elapsed
+                if result is None:
+                    stage.dropped += 1
+            if result is None:
+                self._exit(item)
+            self._forward(index, seq, result)
+
+        with runner.lock:
+            runner.running -= 1
+            last = runner.running == 0
+        if last:
+            # The last worker out closes the stage and stops the next one
+            try:
+                stage.close()
+            except Exception as e:
+                logging.error(f"[PIPE] Closing stage {stage.name} failed: {e}")
+            if index + 1 < len(self._runners):
+                following = self._runners[index + 1]
+                for _ in range(following.stage.workers):
+                    following.inbox.put(_STOP)
+
+    def _forward(self, index, seq, result):
+        """Hand a finished item to the next stage, in arrival order for ordered stages."""
+        runner = self._runners[index]
+        with runner.lock:
+            if not runner.stage.ordered:
+                if result is not None:
+                    self._emit(index, result)
+                return
+            runner.pending[seq] = result
+            # Dropped items still fill their place, so later ones are not held back
+            while runner.next_in in runner.pending:
+                ready = runner.pending.pop(runner.next_in)
+                runner.next_in += 1
+                if ready is not None:
+                    self._emit(index, ready)
+
+    def _emit(self, index, item):
+        # Called with the stage lock held, so the next stage sees a dense sequence
+        if index + 1 == len(self._runners):
+            self._exit(item)
+            return
+        runner = self._runners[index]
+        self._runners[index + 1].inbox.put((runner.next_out, item))
+        runner.next_out += 1
+
+    def _exit(self, item):
+        if self.on_exit is None:
+            return
+        try:
+            self.on_exit(item)
+        except Exception as e:
+            logging.error(f"[PIPE] Handling a finished item failed: {e}")
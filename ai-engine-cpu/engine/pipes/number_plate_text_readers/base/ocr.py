@@ -1,8 +1,11 @@
+import copy
+
 import numpy as np
 from typing import List, Tuple, Any, Dict
-from engine.tools.image_processing import normalize_img
+import cv2
+from engine.tools.image_processing import normalize_img, normalize_img_chw
 from engine.tools.ocr_tools import StrLabelConverter, decode_batch
-import onnxruntime as rt
+from engine.tools.onnx_tools import create_session
 
 
 class Ocr:
@@ -55,14 +58,37 @@ class Ocr:
         self.max_text_len = 9
         self.letters_max = len(self.letters) + 1
         self.label_length = 13
+        # None when the model accepts any batch size
+        self.max_batch_size = None
+
+        # Reused by preprocess_crops
+        self._input_buffer = np.empty(
+            (0, self.color_channels, self.height, self.width), dtype=np.float32
+        )
+        self._resized = np.empty((self.height, self.width, 3), dtype=np.uint8)
 
-    def load_model(self, engine_file_path):
-        self.engine = rt.InferenceSession(engine_file_path)
+    def load_model(self, engine_file_path, session_config=None):
+        # session_config: flat ONNX Runtime settings, see engine.tools.onnx_tools
+        self.engine = create_session(engine_file_path, session_config)
         self.input_name = self.engine.get_inputs()[0].name
         # Get the output names
         self.output_names = [s.name for s in self.engine.get_outputs()]
+        batch_dim = self.engine.get_inputs()[0].shape[0]
+        self.max_batch_size = batch_dim if isinstance(batch_dim, int) else None
         return self.engine
 
+    def clone(self):
+        """
+        OCR model sharing this one's session, with its own preprocessing buffers.
+
+        InferenceSession.run is thread-safe, so clones let several pipeline
+        workers run the model at once without overwriting each other's input.
+        """
+        clone = copy.copy(self)
+        clone._input_buffer = np.empty_like(self._input_buffer[:0])
+        clone._resized = np.empty_like(self._resized)
+        return clone
+
     def init_label_converter(self):
         self.label_converter = StrLabelConverter(
             "".join(self.letters), self.max_text_len
@@ -79,14 +105,88 @@ class Ocr:
             xs = np.array(imgs)
         return xs
 
-    def predict(self, xs: np.ndarray, return_acc: bool = False) -> Any:
+    def preprocess_crops(self, img: np.ndarray, boxes) -> np.ndarray:
+        """
+        Crop, resize and normalize plates straight into the reusable model input.
+
+        Every box is cropped from the BGR image, resized directly to the model
+        resolution, converted to RGB and min-max normalized while being written
+        as CHW float32 into a preallocated batch buffer.
+
+        Args:
+            img (np.ndarray): BGR source image (frame or region).
+            boxes: Iterable of integer (x_min, y_min, x_max, y_max) boxes in `img`.
+
+        Returns:
+            np.ndarray: (N, C, H, W) view of the internal buffer; it is overwritten
+            by the next call.
+        """
+        boxes = list(boxes)
+        if len(boxes) > len(self._input_buffer):
+            # Grow in powers of two so the buffer settles after a few frames
+            capacity = 1 << (len(boxes) - 1).bit_length()
+            self._input_buffer = np.empty(
+                (capacity, self.color_channels, self.height, self.width),
+                dtype=np.float32,
+            )
+
+        xs = self._input_buffer[: len(boxes)]
+        for x, (x_min, y_min, x_max, y_max) in zip(xs, boxes):
+            resized = cv2.resize(
+                img[y_min:y_max, x_min:x_max],
+                (self.width, self.height),
+                dst=self._resized,
+            )
+            normalize_img_chw(resized, x, swap_rb=True)
+        return xs
+
+    def read(self, img, boxes):
+        """
+        Read the plates in `boxes` of a BGR image, see preprocess_crops and predict.
+
+        Returns:
+            tuple: (texts, char_confidences, plate_confidences).
+        """
+        return self.predict(self.preprocess_crops(img, boxes), return_confidence=True)
+
+    def infer(self, xs: np.ndarray) -> np.ndarray:
+        """Raw model output of a preprocessed batch, shape (label_length, batch, letters_max)."""
+        # Run the whole batch at once, or in chunks if the model has a fixed batch size
+        chunk = self.max_batch_size or len(xs)
+        return np.concatenate(
+            [
+                self.engine.run(
+                    self.output_names, {self.input_name: xs[start : start + chunk]}
+                )[0]
+                for start in range(0, len(xs), chunk)
+            ],
+            axis=1,
+        )
+
+    def predict(
+        self, xs: np.ndarray, return_acc: bool = False, return_confidence: bool = False
+    ) -> Any:
+        """
+        Read the plates of a preprocessed batch.
+
+        Returns the upper-cased texts; with return_confidence a tuple
+        (texts, char_confidences, plate_confidences) as from decode_batch, with
+        return_acc a tuple (texts, raw model output per plate).
+        """
+        if not len(xs):
+            if return_confidence:
+                return [], [], np.empty(0, dtype=np.float32)
+            return ([], []) if return_acc else []
 
-        out = self.engine.run(self.output_names, {self.input_name: xs})
-        pred_texts = decode_batch(np.array(out), self.label_converter)
+        out = self.infer(xs)
+        if return_confidence:
+            pred_texts, char_confidences, plate_confidences = decode_batch(
+                out, self.label_converter, return_confidence=True
+            )
+            pred_texts = [pred_text.upper() for pred_text in pred_texts]
+            return pred_texts, char_confidences, plate_confidences
+        pred_texts = decode_batch(out, self.label_converter)
         pred_texts = [pred_text.upper() for pred_text in pred_texts]
         if return_acc:
-            if len(out):
-                out = np.array(out)
-                out = out.reshape((out.shape[1], out.shape[0], out.shape[2]))
-            return pred_texts, out
+            return pred_texts, np.moveaxis(out, 1, 0)
         return pred_texts
@@ -1,6 +1,15 @@
+import copy
+
 import numpy as np
 import cv2
-import onnxruntime as rt
+from engine.tools.detection_tools import (
+    batched_nms,
+    filter_detections,
+    make_detections,
+    nms,
+)
+from engine.tools.image_processing import normalize_img_chw
+from engine.tools.onnx_tools import create_session
 
 
 class LicensePlateDetector:
@@ -15,13 +24,38 @@ class LicensePlateDetector:
         self.confidence_threshold = config.get("threshold", 0.5)
         self.top_n = config.get("top_n", 5)
         self.iou_threshold = config.get("iou_threshold", 0.5)
+        # None when the model accepts any batch size
+        self.max_batch_size = None
 
-    def load_model(self, engine_file_path):
-        self.engine = rt.InferenceSession(engine_file_path)
+        # Reused by preprocess_batch so the hot loop does not allocate
+        self._input_buffer = np.empty(
+            (0, self.color_channels, self.height, self.width), dtype=np.float32
+        )
+        self._resized = np.empty(
+            (self.height, self.width, self.color_channels), dtype=np.uint8
+        )
+
+    def load_model(self, engine_file_path, session_config=None):
+        # session_config: flat ONNX Runtime settings, see engine.tools.onnx_tools
+        self.engine = create_session(engine_file_path, session_config)
         self.input_name = self.engine.get_inputs()[0].name
         self.output_names = [s.name for s in self.engine.get_outputs()]
+        batch_dim = self.engine.get_inputs()[0].shape[0]
+        self.max_batch_size = batch_dim if isinstance(batch_dim, int) else None
         return self.engine
 
+    def clone(self):
+        """
+        Detector sharing this one's session, with its own preprocessing buffers.
+
+        InferenceSession.run is thread-safe, so clones let several pipeline
+        workers run the model at once without overwriting each other's input.
+        """
+        clone = copy.copy(self)
+        clone._input_buffer = np.empty_like(self._input_buffer[:0])
+        clone._resized = np.empty_like(self._resized)
+        return clone
+
     def preprocess(self, img, need_preprocess=True):
         if need_preprocess:
             image_data = cv2.resize(img, (self.width, self.height))
@@ -32,20 +66,44 @@ class LicensePlateDetector:
         image_data = np.expand_dims(image_data, axis=0)
         return image_data
 
-    def initial_filtering(self, scores, boxes):
-        # Flatten the confidence scores and box coordinates
-        confidence_scores = scores[:, 1]
-        boxes_above_threshold = boxes[confidence_scores > self.confidence_threshold]
-        confidences_above_threshold = confidence_scores[
-            confidence_scores > self.confidence_threshold
-        ]
+    def preprocess_batch(self, imgs):
+        """
+        Resize and normalize a batch of BGR images into the reusable NCHW input.
+
+        Every image is resized into a persistent uint8 buffer and min-max
+        normalized while being written in CHW order into its slot of a persistent
+        float32 batch buffer, the same result as stacking preprocess outputs.
+
+        Args:
+            imgs (list): BGR images (e.g. the regions of a frame).
+
+        Returns:
+            np.ndarray: (N, C, H, W) view of the internal buffer; it is overwritten
+            by the next call.
+        """
+        if len(imgs) > len(self._input_buffer):
+            # Grow in powers of two so the buffer settles after the first frames
+            capacity = 1 << (len(imgs) - 1).bit_length()
+            self._input_buffer = np.empty(
+                (capacity, self.color_channels, self.height, self.width),
+                dtype=np.float32,
+            )
 
-        # Sort by confidence and select the top N detections
-        top_indices = np.argsort(confidences_above_threshold)[-self.top_n :][::-1]
+        xs = self._input_buffer[: len(imgs)]
+        for x, img in zip(xs, imgs):
+            resized = cv2.resize(img, (self.width, self.height), dst=self._resized)
+            normalize_img_chw(resized, x)
+        return xs
 
-        top_boxes = boxes_above_threshold[top_indices]
-        top_confidences = confidences_above_threshold[top_indices]
+    def detect(self, imgs):
+        """Detect license plates on a list of BGR images, see preprocess_batch and predict_batch."""
+        return self.predict_batch(self.preprocess_batch(imgs))
 
+    def initial_filtering(self, scores, boxes):
+        # Threshold once, then select the top N detections without a full sort
+        top_boxes, top_confidences, _ = filter_detections(
+            scores[None], boxes[None], self.confidence_threshold, self.top_n
+        )
         return top_boxes, top_confidences
 
     def predict(self, xs: np.ndarray):
@@ -55,6 +113,50 @@ class LicensePlateDetector:
         scores = np.squeeze(out[0], axis=0)  # shape: (3000, 2)
         boxes = np.squeeze(out[1], axis=0)  # shape: (3000, 4)
 
+        return self.postprocess(scores, boxes)
+
+    def predict_batch(self, xs: np.ndarray):
+        """
+        Detect license plates on a batch of preprocessed images.
+
+        The whole batch goes through a single InferenceSession.run call (or one
+        call per chunk when the model has a fixed batch size); thresholding and
+        top-N are applied per image and NMS runs batched, never mixing boxes of
+        different images.
+
+        Args:
+            xs (np.ndarray): NCHW batch, as returned by preprocess_batch.
+
+        Returns:
+            np.ndarray: DETECTION_DTYPE array of all detections in the batch; the
+            region column holds the index of the image they were found in.
+        """
+        return self.postprocess_batch(*self.infer_batch(xs))
+
+    def infer_batch(self, xs: np.ndarray):
+        """Raw model outputs of a preprocessed batch: scores (N, 3000, 2) and boxes (N, 3000, 4)."""
+        chunk = self.max_batch_size or len(xs)
+        scores, boxes = [], []
+        for start in range(0, len(xs), chunk):
+            out = self.engine.run(
+                self.output_names, {self.input_name: xs[start : start + chunk]}
+            )
+            scores.append(out[0])  # shape: (N, 3000, 2)
+            boxes.append(out[1])  # shape: (N, 3000, 4)
+        return np.concatenate(scores, axis=0), np.concatenate(boxes, axis=0)
+
+    def postprocess_batch(self, scores, boxes):
+        """Threshold and top-N per image, then a single NMS pass over the whole batch."""
+        top_boxes, top_confidences, image_ids = filter_detections(
+            scores, boxes, self.confidence_threshold, self.top_n
+        )
+        keep = batched_nms(top_boxes, top_confidences, image_ids, self.iou_threshold)
+
+        return make_detections(
+            top_boxes[keep], top_confidences[keep], image_ids[keep]
+        )
+
+    def postprocess(self, scores, boxes):
         # Perform initial filtering
         top_boxes, top_confidences = self.initial_filtering(scores, boxes)
 
@@ -63,55 +165,8 @@ class LicensePlateDetector:
             top_boxes, top_confidences
         )
 
-        # Prepare the list of detection objects
-        detections = []
-        for box, confidence in zip(final_boxes, final_confidences):
-            x_min = box[0]
-            y_min = box[1]
-            x_max = box[2]
-            y_max = box[3]
-
-            detection = type("Detection", (object,), {})()
-            detection.Left = x_min
-            detection.Right = x_max
-            detection.Top = y_min
-            detection.Bottom = y_max
-            detection.Confidence = confidence
-
-            detections.append(detection)
-
-        return detections
+        return make_detections(final_boxes, final_confidences)
 
     def non_maximum_suppression(self, boxes, confidences):
-        if len(boxes) == 0:
-            return np.array([]), np.array([])  # Return two empty arrays instead of an empty list
-
-        x1 = boxes[:, 0]
-        y1 = boxes[:, 1]
-        x2 = boxes[:, 2]
-        y2 = boxes[:, 3]
-
-        areas = (x2 - x1 + 1) * (y2 - y1 + 1)
-        order = confidences.argsort()[::-1]
-
-        keep = []
-        while order.size > 0:
-            i = order[0]
-            keep.append(i)
-            xx1 = np.maximum(x1[i], x1[order[1:]])
-            yy1 = np.maximum(y1[i], y1[order[1:]])
-            xx2 = np.minimum(x2[i], x2[order[1:]])
-            yy2 = np.minimum(y2[i], y2[order[1:]])
-
-            w = np.maximum(0, xx2 - xx1 + 1)
-            h = np.maximum(0, yy2 - yy1 + 1)
-
-            inter = w * h
-            iou = inter / (areas[i] + areas[order[1:]] - inter)
-
-            indices_to_keep = np.where(iou <= self.iou_threshold)[0]
-            order = order[indices_to_keep + 1]
-
-        final_boxes = boxes[keep]
-        final_confidences = confidences[keep]
-        return final_boxes, final_confidences
+        keep = nms(boxes, confidences, self.iou_threshold)
+        return boxes[keep], confidences[keep]
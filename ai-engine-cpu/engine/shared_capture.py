@@ -0,0 +1,491 @@
+import logging
+import multiprocessing as mp
+import signal
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import cv2
+import numpy as np
+
+from engine.capture import Frame
+
+# int64 header fields in front of the frame slots
+_LATEST = 0  # Slot of the newest frame, -1 before the first one
+_CONSUMED = 1  # Sequence number of the last frame handed to the reader
+_CAPTURED = 2
+_DROPPED = 3
+_RECONNECTS = 4
+_FIELDS = 5
+
+
+class FrameRingBuffer:
+    """
+    Frame slots plus a small header in one shared memory block.
+
+    The block starts with the header fields, followed by the sequence number,
+    reader count and timestamp of every slot and then the frame slots. Header
+    access happens under `lock`. A slot's pixels are only written while it is
+    neither the newest frame nor held by a reader, so the reader maps frames as
+    NumPy views without copying them.
+
+    Args:
+        shm (shared_memory.SharedMemory): Block of at least buffer_size bytes.
+        shape (tuple): Frame shape (height, width, channels).
+        slots (int): Number of frame slots.
+        lock (multiprocessing.Lock): Guards the header.
+    """
+
+    def __init__(self, shm, shape, slots, lock):
+        self.shm = shm
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.lock = lock
+
+        buf = shm.buf
+        self.header = np.ndarray((_FIELDS,), dtype=np.int64, buffer=buf)
+        offset = self.header.nbytes
+        self.seqs = np.ndarray((slots,), dtype=np.int64, buffer=buf, offset=offset)
+        offset += self.seqs.nbytes
+        self.readers = np.ndarray((slots,), dtype=np.int64, buffer=buf, offset=offset)
+        offset += self.readers.nbytes
+        self.timestamps = np.ndarray(
+            (slots,), dtype=np.float64, buffer=buf, offset=offset
+        )
+        self.frames = np.ndarray(
+            (slots, *self.shape),
+            dtype=np.uint8,
+            buffer=buf,
+            offset=self.header_size(slots),
+        )
+
+    @staticmethod
+    def header_size(slots):
+        size = 8 * (_FIELDS + 3 * slots)
+        return (size + 63) // 64 * 64  # Keep the frames cache-line aligned
+
+    @classmethod
+    def create(cls, shape, slots, lock):
+        """Allocate a new, empty ring buffer."""
+        size = cls.header_size(slots) + slots * int(np.prod(shape))
+        ring = cls(
+            shared_memory.SharedMemory(create=True, size=size), shape, slots, lock
+        )
+        ring.header[:] = 0
+        ring.header[_LATEST] = -1
+        ring.header[_CONSUMED] = -1
+        ring.seqs[:] = -1
+        ring.readers[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name, shape, slots, lock):
+        """Map a ring buffer created by another process."""
+        return cls(shared_memory.SharedMemory(name=name), shape, slots, lock)
+
+    def close(self, unlink=False):
+        # Unmapping does not wait for views held elsewhere, and touching one
+        # afterwards crashes the process; callers close once none is in use
+        # (see ProcessFrameGrabber.stop)
+        del self.header, self.seqs, self.readers, self.timestamps, self.frames
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+    def counter(self, field):
+        with self.lock:
+            return int(self.header[field])
+
+    def increment(self, field):
+        with self.lock:
+            self.header[field] += 1
+
+    def acquire_write_slot(self):
+        """Oldest slot that is neither the newest frame nor read; None if all are busy."""
+        with self.lock:
+            free = [
+                slot
+                for slot in range(self.slots)
+                if slot != self.header[_LATEST] and not self.readers[slot]
+            ]
+            return min(free, key=lambda slot: self.seqs[slot]) if free else None
+
+    def publish(self, slot, seq, timestamp):
+        """Make the frame just written to `slot` the newest one."""
+        with self.lock:
+            latest = self.header[_LATEST]
+            if latest >= 0 and self.seqs[latest] > self.header[_CONSUMED]:
+                # Previous frame was never consumed
+                self.header[_DROPPED] += 1
+            self.seqs[slot] = seq
+            self.timestamps[slot] = timestamp
+            self.header[_LATEST] = slot
+            self.header[_CAPTURED] += 1
+
+    def read_latest(self):
+        """
+        Hand the newest unconsumed frame to the reader.
+
+        Returns:
+            tuple | None: (slot, seq, timestamp), or None without a new frame. The
+            slot stays reserved until release_slot is called.
+        """
+        with self.lock:
+            slot = self.header[_LATEST]
+            if slot < 0 or self.seqs[slot] <= self.header[_CONSUMED]:
+                return None
+            self.readers[slot] += 1
+            self.header[_CONSUMED] = self.seqs[slot]
+            return int(slot), int(self.seqs[slot]), float(self.timestamps[slot])
+
+    def release_slot(self, slot):
+        with self.lock:
+            self.readers[slot] -= 1
+
+
+def _capture_worker(
+    source, name, max_retries, retry_delay, slots, lock, conn, new_frame, stop
+):
+    """
+    Capture process: decode `source` into a FrameRingBuffer.
+
+    Reports ("ready", shm name, shape) or ("error", message) on `conn` after the
+    first frame, ("failed", message) when giving up, and sets `new_frame` after
+    every published frame.
+    """
+    # Ctrl+C is handled by the inference process, which stops this one
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    stream = cv2.VideoCapture(source)
+    ret, image = stream.read() if stream.isOpened() else (False, None)
+    if not ret:
+        conn.send(("error", f"Could not open video source: {source}"))
+        return
+
+    stream.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    ring = FrameRingBuffer.create(image.shape, slots, lock)
+    slot_frames = list(ring.frames)
+    conn.send(("ready", ring.shm.name, image.shape))
+    try:
+        seq = 0
+        retries = 0
+        slot_frames[0][:] = image
+        ring.publish(0, seq, time.monotonic())
+        resize_warned = False
+        while not stop.is_set():
+            slot = ring.acquire_write_slot()
+            if slot is None:
+                # The reader holds every free slot: keep the stream moving
+                ret = stream.grab()
+                image = None
+            else:
+                ret, image = stream.read(image=slot_frames[slot])
+            if not ret:
+                logging.error(f"[CAP] Failed to capture frame from stream {name}.")
+                retries += 1
+                stream.release()
+                if retries > max_retries:
+                    conn.send(
+                        (
+                            "failed",
+                            f"Failed to capture frame from stream {name} "
+                            f"after {retries} attempts",
+                        )
+                    )
+                    break
+                if stop.wait(retry_delay):
+                    break
+                logging.warning(f"[CAP] Attempting to reconnect to stream {name}...")
+                stream = cv2.VideoCapture(source)
+                if stream.isOpened():
+                    stream.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+                    ring.increment(_RECONNECTS)
+                continue
+            retries = 0  # Reset counter on success
+            if image is None:
+                continue
+
+            if image is not slot_frames[slot]:
+                # The stream changed resolution, scale back to the ring's frame size
+                if not resize_warned:
+                    logging.warning(
+                        f"[CAP] Stream {name} changed to {image.shape[1]}x{image.shape[0]},"
+                        " resizing frames to the initial resolution."
+                    )
+                    resize_warned = True
+                cv2.resize(image, (ring.shape[1], ring.shape[0]), dst=slot_frames[slot])
+
+            seq += 1
+            ring.publish(slot, seq, time.monotonic())
+            new_frame.set()
+    finally:
+        stream.release()
+        new_frame.set()
+        del slot_frames
+        ring.close(unlink=True)
+
+
+class ProcessFrameGrabber:
+    """
+    FrameGrabber variant that decodes in a separate capture process.
+
+    The capture process writes frames into a FrameRingBuffer in shared memory,
+    so decoding runs on its own core without competing for the GIL, and frames
+    reach this process as zero-copy NumPy views instead of pickled arrays. The
+    interface and latest-frame-wins semantics match FrameGrabber; a frame's slot
+    stays reserved until Frame.release() is called.
+
+    The process is forked, so it must be started from the main thread and it
+    only ever runs the capture loop. Fork it before any other thread of the
+    process runs (MQTT network loop, pipeline stages, metrics server, the
+    watcher threads of other grabbers): a fork copies locks held by other
+    threads, and the child opening an FFmpeg/OpenSSL stream could wait on them
+    forever. With several cameras, open() all of their grabbers first and
+    start() them afterwards.
+
+    Args:
+        source (str | int): Anything accepted by cv2.VideoCapture.
+        name (str): Name used in log messages.
+        max_retries (int): Consecutive reconnect attempts before giving up.
+        retry_delay (float): Delay between reconnect attempts (in seconds).
+        notify (threading.Event, optional): Set whenever a new frame arrives or the
+            worker fails.
+        slots (int): Frame slots of the ring buffer; at least three are needed for
+            the frame being decoded, the newest frame and the one being processed.
+        open_timeout (float): Seconds to wait for the first frame on start.
+    """
+
+    def __init__(
+        self,
+        source,
+        name="camera",
+        max_retries=5,
+        retry_delay=5,
+        notify=None,
+        slots=4,
+        open_timeout=30,
+    ):
+        self.source = source
+        self.name = name
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.notify = notify
+        self.slots = max(slots, 3)
+        self.open_timeout = open_timeout
+
+        self.error = None
+
+        self._context = mp.get_context("fork")
+        self._lock = self._context.Lock()
+        self._new_frame = self._context.Event()
+        self._stop = self._context.Event()
+        self._conn = None
+        self._process = None
+        self._ring = None
+        self._slot_views = []
+        # Frames handed out by read() and not released yet; the ring buffer
+        # stays mapped until they are, see stop()
+        self._outstanding = 0
+        self._closing = False
+        self._slots_lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._running = False
+        self._watcher = None
+
+    @property
+    def failed(self):
+        """True when the capture process gave up after exceeding max_retries."""
+        return self.error is not None
+
+    @property
+    def frames_captured(self):
+        return self._ring.counter(_CAPTURED) if self._ring else 0
+
+    @property
+    def frames_dropped(self):
+        return self._ring.counter(_DROPPED) if self._ring else 0
+
+    @property
+    def reconnects(self):
+        return self._ring.counter(_RECONNECTS) if self._ring else 0
+
+    def open(self):
+        """
+        Fork the capture process and wait for its first frame, without
+        starting any thread in this process.
+
+        Returns:
+            ProcessFrameGrabber: self, for chaining.
+
+        Raises:
+            ConnectionError: If the source can not be opened.
+        """
+        if self._ring is not None:
+            return self
+        # Share one resource tracker, so the block is only unlinked once
+        resource_tracker.ensure_running()
+        self._conn, child_conn = self._context.Pipe(duplex=False)
+        self._process = self._context.Process(
+            target=_capture_worker,
+            args=(
+                self.source,
+                self.name,
+                self.max_retries,
+                self.retry_delay,
+                self.slots,
+                self._lock,
+                child_conn,
+                self._new_frame,
+                self._stop,
+            ),
+            name=f"capture-{self.name}",
+            daemon=True,
+        )
+        self._process.start()
+        child_conn.close()
+
+        if not self._conn.poll(self.open_timeout):
+            self._terminate()
+            raise ConnectionError(f"Timed out opening video source: {self.source}")
+        message = self._conn.recv()
+        if message[0] != "ready":
+            self._terminate()
+            raise ConnectionError(message[1])
+
+        _, shm_name, shape = message
+        self._ring = FrameRingBuffer.attach(shm_name, shape, self.slots, self._lock)
+        self._slot_views = list(self._ring.frames)
+        return self
+
+    def start(self):
+        """
+        Open the capture process, unless open() already did, and start
+        delivering frames.
+
+        Returns:
+            ProcessFrameGrabber: self, for chaining.
+
+        Raises:
+            ConnectionError: If the source can not be opened.
+        """
+        self.open()
+        self._running = True
+        self._watcher = threading.Thread(
+            target=self._watch, name=f"capture-watch-{self.name}", daemon=True
+        )
+        self._watcher.start()
+        return self
+
+    def stop(self):
+        """
+        Stop the capture process and unmap the ring buffer.
+
+        Frames returned by read() and not released yet keep the ring buffer
+        mapped; it is unmapped when the last of them is released.
+        """
+        self._running = False
+        self._stop.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._watcher is not None:
+            self._watcher.join(timeout=2)
+        self._terminate()
+        with self._slots_lock:
+            self._closing = True
+            if self._outstanding:
+                logging.debug(
+                    "[CAP] Keeping the ring buffer of %s mapped until %d frames are released",
+                    self.name,
+                    self._outstanding,
+                )
+                return
+            self._close_ring()
+
+    def _close_ring(self):
+        # Called with _slots_lock held, once no frame views the ring buffer
+        if self._ring is not None:
+            self._slot_views = []
+            self._ring.close()
+            self._ring = None
+
+    def _terminate(self):
+        if self._process is not None:
+            self._stop.set()
+            self._process.join(timeout=self.retry_delay + 2)
+            if self._process.is_alive():
+                self._process.terminate()
+                self._process.join()
+            self._process = None
+
+    def read(self, timeout=None):
+        """
+        Return the newest frame that has not been returned yet.
+
+        The frame's image is a view into shared memory; the caller calls
+        Frame.release() when done so the capture process can reuse the slot.
+
+        Args:
+            timeout (float, optional): Seconds to wait for a new frame. None waits forever.
+
+        Returns:
+            Frame | None: The newest frame, or None on timeout, stop or failure.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                result = self._read_latest()
+                if result is not None or not self._running or self.failed:
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+        if result is None:
+            return None
+        slot, seq, timestamp = result
+        shared = (self._ring.shm.name, self._ring.shape, self.slots, slot)
+        return Frame(self._slot_views[slot], seq, timestamp, self, shared)
+
+    def _read_latest(self):
+        with self._slots_lock:
+            if not self._running or self._ring is None:
+                return None
+            result = self._ring.read_latest()
+            if result is not None:
+                self._outstanding += 1
+            return result
+
+    def release(self, image):
+        """Called by Frame.release(): free the slot holding `image`."""
+        with self._slots_lock:
+            for slot, view in enumerate(self._slot_views):
+                if view is image:
+                    self._ring.release_slot(slot)
+                    self._outstanding -= 1
+                    break
+            if self._closing and not self._outstanding:
+                self._close_ring()
+
+    def _watch(self):
+        # Turn the capture process' signals into thread-level notifications
+        while self._running:
+            if self._conn.poll():
+                try:
+                    kind, message = self._conn.recv()[:2]
+                except EOFError:
+                    kind, message = "failed", f"Capture process of {self.name} exited"
+                if kind == "failed":
+                    self.error = ConnectionError(message)
+            elif not self._process.is_alive() and not self._stop.is_set():
+                self.error = ConnectionError(f"Capture process of {self.name} exited")
+
+            woke = self._new_frame.wait(timeout=0.5)
+            if woke:
+                self._new_frame.clear()
+            if woke or self.failed:
+                with self._condition:
+                    self._condition.notify_all()
+                if self.notify is not None:
+                    self.notify.set()
+            if self.failed:
+                break
@@ -0,0 +1,356 @@
+import logging
+import threading
+
+import numpy as np
+
+from engine.pipeline import Stage
+from engine.tools.detection_tools import to_pixel_boxes
+
+
+class FrameJob:
+    """
+    One camera frame travelling through the plate pipeline.
+
+    Every stage fills in its results; the frame is released as soon as no
+    later stage needs the image, and again (harmlessly) when the job leaves
+    the pipeline, so dropped jobs never keep a capture buffer.
+
+    Attributes:
+        camera (Camera): Camera the frame was captured from.
+        frame (Frame): Frame returned by the camera's grabber.
+        regions (list): Indices of the regions to detect on.
+        region_imgs (list): Crops of those regions, views into the frame.
+        region_rects, region_origins, region_sizes (np.ndarray): The camera's
+            region geometry the frame was cropped with, kept with the job
+            because the camera's changes with the stream's resolution while
+            earlier frames are still in flight.
+        detections (np.ndarray): DETECTION_DTYPE detections, region column
+            holding region indices.
+        boxes (np.ndarray): Pixel boxes of the detections in frame coordinates.
+        tracks (list): Track of every detection.
+        removed (list): Tracks that ended with this frame.
+        reads (list): Indices of the detections to read.
+        texts, char_confidences, confidences (list): OCR results of `reads`.
+    """
+
+    __slots__ = (
+        "camera",
+        "frame",
+        "regions",
+        "region_imgs",
+        "region_rects",
+        "region_origins",
+        "region_sizes",
+        "detections",
+        "boxes",
+        "tracks",
+        "removed",
+        "reads",
+        "texts",
+        "char_confidences",
+        "confidences",
+    )
+
+    def __init__(
+        self,
+        camera,
+        frame,
+        regions,
+        region_imgs,
+        region_rects,
+        region_origins,
+        region_sizes,
+    ):
+        self.camera = camera
+        self.frame = frame
+        self.regions = regions
+        self.region_imgs = region_imgs
+        self.region_rects = region_rects
+        self.region_origins = region_origins
+        self.region_sizes = region_sizes
+        self.detections = None
+        self.boxes = None
+        self.tracks = []
+        self.removed = []
+        self.reads = []
+        self.texts = []
+        self.char_confidences = []
+        self.confidences = []
+
+    @property
+    def timestamp(self):
+        return self.frame.timestamp
+
+    def release(self):
+        """Give the frame buffer back to the grabber; the crops are unusable afterwards."""
+        self.region_imgs = None
+        self.frame.release()
+
+
+def gate_frame(camera, frame):
+    """
+    Crop the regions of a frame and keep those that need plate detection.
+
+    Motion gating is cheap enough to run on the capture side, so frames
+    without motion never occupy a pipeline queue.
+
+    Args:
+        camera (Camera): Camera the frame was captured from.
+        frame (Frame): Frame returned by the camera's grabber.
+
+    Returns:
+        FrameJob: Job for the pipeline, or None when no region needs detection.
+    """
+    image = frame.image
+    # Crop the regions in the native resolution instead of resizing the whole frame
+    camera.update_resolution(image.shape[1], image.shape[0])
+    rects, origins, sizes = (
+        camera.region_rects,
+        camera.region_origins,
+        camera.region_sizes,
+    )
+    region_imgs = [image[y1:y2, x1:x2] for x1, y1, x2, y2 in rects.tolist()]
+
+    # Only detect on regions with motion, keep-alive checks or plates still being read
+    regions = list(range(len(camera.regions)))
+    if camera.motion_gates is not None:
+        # Snapshot published by TrackStage, the tracks change on its thread
+        pending = camera.tracker.pending
+        regions = [
+            i
+            for i, (gate, region_img) in enumerate(
+                zip(camera.motion_gates, region_imgs)
+            )
+            if gate.update(region_img, frame.timestamp, force=i in pending)
+        ]
+        if not regions:
+            return None
+    return FrameJob(
+        camera,
+        frame,
+        regions,
+        [region_imgs[i] for i in regions],
+        rects,
+        origins,
+        sizes,
+    )
+
+
+class DetectStage(Stage):
+    """
+    Batched plate detection on the regions of a FrameJob.
+
+    Args:
+        net (LicensePlateDetector): Loaded detector, or the detector of an
+            InferencePool, which also gets the frame so its workers can map
+            shared-memory frames; every worker uses a clone.
+        workers (int): Detection threads.
+        queue_size (int): Jobs waiting for detection.
+    """
+
+    def __init__(self, net, workers=1, queue_size=1):
+        super().__init__("detect", workers=workers, queue_size=queue_size)
+        self.net = net
+        self.takes_frame = getattr(net, "takes_frame", False)
+        self._local = threading.local()
+
+    def process(self, job):
+        net = getattr(self._local, "net", None)
+        if net is None:
+            net = self._local.net = self.net.clone()
+        camera = job.camera
+
+        # Detect plates in all regions with a single batched inference call
+        try:
+            if self.takes_frame:
+                detections = net.detect(
+                    job.region_imgs,
+                    frame=job.frame,
+                    rects=job.region_rects[job.regions],
+                )
+            else:
+                detections = net.detect(job.region_imgs)
+        except Exception as e:
+            logging.error(f"Error detecting plates on camera {camera.id}: {e}")
+            return None
+        job.region_imgs = None
+        # Batch index -> region index
+        detections["region"] = np.asarray(job.regions, dtype=np.int32)[
+            detections["region"]
+        ]
+
+        # print the detections, counting them only when debug logging is on
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            for region, count in zip(
+                camera.regions,
+                np.bincount(detections["region"], minlength=len(camera.regions)),
+            ):
+                logging.debug(
+                    "[DET] Detected %d objects in region %s of camera %s",
+                    count,
+                    region.name,
+                    camera.id,
+                )
+
+        # Pixel boxes inside each region, then the same boxes in frame coordinates
+        region_boxes = to_pixel_boxes(detections, job.region_sizes)
+        # Skip boxes that collapse to nothing in pixels
+        valid = (region_boxes[:, 2] > region_boxes[:, 0]) & (
+            region_boxes[:, 3] > region_boxes[:, 1]
+        )
+        job.detections = detections[valid]
+        job.boxes = region_boxes[valid] + np.tile(
+            job.region_origins[job.detections["region"]], 2
+        )
+        return job
+
+
+class TrackStage(Stage):
+    """
+    Matches the detections of a FrameJob to the camera's tracks and picks the
+    plates to read. Tracking needs the frames in order, so it has one worker.
+    """
+
+    def __init__(self, queue_size=1):
+        super().__init__("track", workers=1, queue_size=queue_size)
+
+    def process(self, job):
+        # Follow the plates across frames so each one is read once per visit
+        tracker = job.camera.tracker
+        job.tracks = tracker.update(
+            job.boxes,
+            job.detections["region"],
+            job.timestamp,
+            regions_checked=set(job.regions),
+        )
+        job.removed = tracker.removed
+        tracker.pending = frozenset(tracker.pending_regions())
+
+        # Only read plates without a confident read yet or due for revalidation
+        job.reads = [
+            i
+            for i, track in enumerate(job.tracks)
+            if tracker.needs_ocr(track, job.timestamp)
+        ]
+        if not job.reads:
+            job.release()
+        return job
+
+
+class OcrStage(Stage):
+    """
+    Reads the plates a FrameJob picked for OCR and releases its frame.
+
+    Args:
+        ocr (Ocr): Loaded OCR model, or the OCR model of an InferencePool,
+            which also gets the frame, see DetectStage; every worker uses a clone.
+        workers (int): OCR threads.
+        queue_size (int): Jobs waiting for OCR.
+    """
+
+    def __init__(self, ocr, workers=1, queue_size=1):
+        super().__init__("ocr", workers=workers, queue_size=queue_size)
+        self.ocr = ocr
+        self.takes_frame = getattr(ocr, "takes_frame", False)
+        self._local = threading.local()
+
+    def process(self, job):
+        if not job.reads:
+            return job
+        ocr = getattr(self._local, "ocr", None)
+        if ocr is None:
+            ocr = self._local.ocr = self.ocr.clone()
+
+        try:
+            logging.debug("[OCR] Reading %d plates.", len(job.reads))
+            boxes = job.boxes[job.reads].tolist()
+            if self.takes_frame:
+                result = ocr.read(job.frame.image, boxes, frame=job.frame)
+            else:
+                result = ocr.read(job.frame.image, boxes)
+            job.texts, job.char_confidences, job.confidences = result
+        except Exception as e:
+            logging.error(f"Error reading plates on camera {job.camera.id}: {e}")
+            job.reads = []
+        job.release()
+        return job
+
+
+class ConsensusStage(Stage):
+    """
+    Adds the reads of a FrameJob to the consensus of their tracks, so the
+    tracker stops picking a plate for OCR once its reads agree. Reads are
+    added in frame order, so it has one worker.
+    """
+
+    def __init__(self, queue_size=1):
+        super().__init__("consensus", workers=1, queue_size=queue_size)
+
+    def process(self, job):
+        tracker = job.camera.tracker
+        for i, license_plate_text, plate_char_confidences, confidence in zip(
+            job.reads, job.texts, job.char_confidences, job.confidences
+        ):
+            track = job.tracks[i]
+            logging.debug(
+                "[OCR] Track %s predicted: %s (%.2f)",
+                track.id,
+                license_plate_text,
+                confidence,
+            )
+            tracker.record_read(
+                track, license_plate_text, plate_char_confidences, job.timestamp
+            )
+        return job
+
+
+class PublishStage(Stage):
+    """
+    Publishes the final plates and ended tracks of a FrameJob over MQTT.
+
+    Args:
+        mqtt_engine (MQTTEngine): Connected MQTT client.
+        queue_size (int): Jobs waiting to be published.
+    """
+
+    def __init__(self, mqtt_engine, queue_size=1):
+        super().__init__("publish", workers=1, queue_size=queue_size)
+        self.mqtt_engine = mqtt_engine
+
+    def process(self, job):
+        camera = job.camera
+        for track in job.removed:
+            self.publish_track_end(camera, track)
+
+        for i in job.reads:
+            track = job.tracks[i]
+            # Publish once the reads agree, and again only if the consensus changes
+            if track.final and track.text != track.published_text:
+                self.publish_read(camera, track)
+        return job
+
+    def publish_read(self, camera, track):
+        """Publish the final read of a track to the ramp."""
+        data = {}
+        data["licensePlate"] = track.text
+        data["cameraId"] = camera.id
+        data["region"] = camera.regions[track.region].name
+        data["trackId"] = track.id
+        data["trackState"] = track.state
+        data["agreement"] = round(track.consensus.agreement, 3)
+        data["reads"] = len(track.consensus.reads)
+        self.mqtt_engine.publish(data, "alpr/ramp/req")
+        track.published_text = track.text
+
+    def publish_track_end(self, camera, track):
+        """Publish the end of a track; kept off alpr/ramp/req so it never opens the ramp."""
+        data = {}
+        data["trackId"] = track.id
+        data["trackState"] = track.state
+        data["licensePlate"] = track.text
+        data["final"] = track.final
+        data["cameraId"] = camera.id
+        data["region"] = camera.regions[track.region].name
+        data["duration"] = round(track.duration, 2)
+        data["hits"] = track.hits
+        self.mqtt_engine.publish(data, "alpr/ai-engine/track")
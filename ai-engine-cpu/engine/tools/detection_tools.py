@@ -0,0 +1,250 @@
+import numpy as np
+
+_EPS = np.finfo(np.float32).eps
+
+# Largest candidate set for which nms precomputes the full IoU matrix
+MATRIX_NMS_MAX_BOXES = 256
+
+# One detection per record: normalized box, confidence and the index of the
+# image (region) of the batch it was found in
+DETECTION_DTYPE = np.dtype(
+    [
+        ("left", np.float32),
+        ("top", np.float32),
+        ("right", np.float32),
+        ("bottom", np.float32),
+        ("confidence", np.float32),
+        ("region", np.int32),
+    ]
+)
+
+
+def top_k(values: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k largest values, sorted in descending order.
+
+    Uses argpartition so only the selected k values get sorted.
+
+    Args:
+        values (np.ndarray): 1D array of values.
+        k (int): Number of indices to return.
+
+    Returns:
+        np.ndarray: Indices of the top-k values, highest first.
+    """
+    if k <= 0 or not len(values):
+        return np.empty(0, dtype=np.intp)
+    if k < len(values):
+        indices = np.argpartition(values, -k)[-k:]
+    else:
+        indices = np.arange(len(values))
+    return indices[np.argsort(values[indices])[::-1]]
+
+
+def box_iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """
+    Pairwise IoU between two sets of (x_min, y_min, x_max, y_max) boxes.
+
+    Coordinates are treated as continuous (e.g. normalized to 0-1), so no
+    +1 pixel terms are added to widths and heights.
+
+    Args:
+        boxes_a (np.ndarray): Boxes of shape (A, 4).
+        boxes_b (np.ndarray): Boxes of shape (B, 4).
+
+    Returns:
+        np.ndarray: IoU matrix of shape (A, B).
+    """
+    # Broadcast per coordinate column, (A, 1) against (1, B), so every NumPy
+    # operation runs over whole rows instead of pairs of coordinates
+    x1_a, y1_a, x2_a, y2_a = (boxes_a[:, i, None] for i in range(4))
+    x1_b, y1_b, x2_b, y2_b = (boxes_b[None, :, i] for i in range(4))
+
+    w = np.minimum(x2_a, x2_b) - np.maximum(x1_a, x1_b)
+    h = np.minimum(y2_a, y2_b) - np.maximum(y1_a, y1_b)
+    np.clip(w, 0, None, out=w)
+    np.clip(h, 0, None, out=h)
+    inter = w * h
+
+    union = (x2_a - x1_a) * (y2_a - y1_a) + (x2_b - x1_b) * (y2_b - y1_b) - inter
+    return inter / np.maximum(union, _EPS)
+
+
+def nms(
+    boxes: np.ndarray,
+    confidences: np.ndarray,
+    iou_threshold: float,
+    image_ids: np.ndarray = None,
+) -> np.ndarray:
+    """
+    Greedy non-maximum suppression.
+
+    Up to MATRIX_NMS_MAX_BOXES candidates the pairwise IoU matrix is computed in
+    one shot and the greedy pass only compacts index arrays; for larger inputs
+    the IoU is computed row by row against the shrinking set of survivors, which
+    avoids the quadratic matrix.
+
+    Args:
+        boxes (np.ndarray): Boxes of shape (N, 4).
+        confidences (np.ndarray): Confidences of shape (N,).
+        iou_threshold (float): Boxes overlapping a kept box by more than this are dropped.
+        image_ids (np.ndarray, optional): Image index of every box; boxes only
+            suppress boxes of the same image.
+
+    Returns:
+        np.ndarray: Indices of the kept boxes, highest confidence first.
+    """
+    if not len(boxes):
+        return np.empty(0, dtype=np.intp)
+
+    order = np.argsort(confidences)[::-1]
+    sorted_boxes = boxes[order]
+
+    keep = []
+    if len(order) <= MATRIX_NMS_MAX_BOXES:
+        overlaps = box_iou_matrix(sorted_boxes, sorted_boxes) > iou_threshold
+        if image_ids is not None:
+            sorted_ids = image_ids[order]
+            overlaps &= sorted_ids[:, None] == sorted_ids[None, :]
+        remaining = np.arange(len(order))
+        while remaining.size:
+            i = remaining[0]
+            keep.append(i)
+            remaining = remaining[1:][~overlaps[i, remaining[1:]]]
+    else:
+        x1, y1, x2, y2 = np.ascontiguousarray(sorted_boxes.T)
+        areas = (x2 - x1) * (y2 - y1)
+        sorted_ids = image_ids[order] if image_ids is not None else None
+        remaining = np.arange(len(order))
+        while remaining.size:
+            i = remaining[0]
+            keep.append(i)
+            rest = remaining[1:]
+            w = np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest])
+            h = np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest])
+            inter = np.maximum(w, 0) * np.maximum(h, 0)
+            # inter / union > threshold, without the division
+            suppressed = inter > iou_threshold * (areas[i] + areas[rest] - inter)
+            if sorted_ids is not None:
+                suppressed &= sorted_ids[rest] == sorted_ids[i]
+            remaining = rest[~suppressed]
+    return order[keep]
+
+
+def batched_nms(
+    boxes: np.ndarray,
+    confidences: np.ndarray,
+    image_ids: np.ndarray,
+    iou_threshold: float,
+) -> np.ndarray:
+    """
+    Non-maximum suppression over boxes from several images.
+
+    Boxes are only suppressed by boxes of the same image. Up to
+    MATRIX_NMS_MAX_BOXES candidates in total all images share one IoU matrix;
+    above that every image runs its own nms, which is faster than the
+    row-wise pass over the pooled candidates.
+
+    Args:
+        boxes (np.ndarray): Boxes of shape (N, 4).
+        confidences (np.ndarray): Confidences of shape (N,).
+        image_ids (np.ndarray): Index of the image every box belongs to, shape (N,).
+        iou_threshold (float): Boxes overlapping a kept box by more than this are dropped.
+
+    Returns:
+        np.ndarray: Indices of the kept boxes, highest confidence first.
+    """
+    if len(boxes) <= MATRIX_NMS_MAX_BOXES:
+        return nms(boxes, confidences, iou_threshold, image_ids)
+
+    keep = []
+    for image_id in np.unique(image_ids):
+        indices = np.flatnonzero(image_ids == image_id)
+        keep.append(indices[nms(boxes[indices], confidences[indices], iou_threshold)])
+    keep = np.concatenate(keep)
+    return keep[np.argsort(confidences[keep], kind="stable")[::-1]]
+
+
+def filter_detections(
+    scores: np.ndarray, boxes: np.ndarray, threshold: float, top_n: int
+):
+    """
+    Threshold and top-N selection of raw SSD outputs for a batch of images.
+
+    Args:
+        scores (np.ndarray): Class scores of shape (N, anchors, 2).
+        boxes (np.ndarray): Boxes of shape (N, anchors, 4).
+        threshold (float): Minimum license plate confidence.
+        top_n (int): Maximum number of candidates kept per image.
+
+    Returns:
+        tuple: (boxes (M, 4), confidences (M,), image_ids (M,)) of the candidates.
+    """
+    confidences = scores[..., 1]
+    image_ids, anchors = np.nonzero(confidences > threshold)
+    candidate_confidences = confidences[image_ids, anchors]
+
+    keep = []
+    # image_ids from np.nonzero are sorted, so every image is a contiguous run
+    bounds = np.searchsorted(image_ids, np.arange(len(scores) + 1))
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        keep.append(start + top_k(candidate_confidences[start:end], top_n))
+    keep = np.concatenate(keep) if keep else np.empty(0, dtype=np.intp)
+
+    return (
+        boxes[image_ids[keep], anchors[keep]],
+        candidate_confidences[keep],
+        image_ids[keep],
+    )
+
+
+def make_detections(
+    boxes: np.ndarray, confidences: np.ndarray, regions=0
+) -> np.ndarray:
+    """
+    Pack boxes and confidences into a DETECTION_DTYPE structured array.
+
+    Args:
+        boxes (np.ndarray): Normalized (left, top, right, bottom) boxes of shape (N, 4).
+        confidences (np.ndarray): Confidences of shape (N,).
+        regions (int | np.ndarray): Region index of every detection.
+
+    Returns:
+        np.ndarray: Structured array of shape (N,).
+    """
+    detections = np.empty(len(boxes), dtype=DETECTION_DTYPE)
+    detections["left"] = boxes[:, 0]
+    detections["top"] = boxes[:, 1]
+    detections["right"] = boxes[:, 2]
+    detections["bottom"] = boxes[:, 3]
+    detections["confidence"] = confidences
+    detections["region"] = regions
+    return detections
+
+
+def to_pixel_boxes(detections: np.ndarray, sizes) -> np.ndarray:
+    """
+    Convert normalized detections to integer pixel boxes for a whole frame at once.
+
+    Args:
+        detections (np.ndarray): DETECTION_DTYPE structured array.
+        sizes: Either one (width, height) pair used for all detections or an array
+            of shape (regions, 2) with the (width, height) of every region, indexed
+            by the detections' region column.
+
+    Returns:
+        np.ndarray: int32 array of shape (N, 4) with (x_min, y_min, x_max, y_max),
+        clipped to the image.
+    """
+    sizes = np.asarray(sizes)
+    if sizes.ndim == 2:
+        sizes = sizes[detections["region"]]
+    width = sizes[..., 0]
+    height = sizes[..., 1]
+
+    boxes = np.empty((len(detections), 4), dtype=np.int32)
+    boxes[:, 0] = np.clip(detections["left"] * width, 0, width)
+    boxes[:, 1] = np.clip(detections["top"] * height, 0, height)
+    boxes[:, 2] = np.clip(detections["right"] * width, 0, width)
+    boxes[:, 3] = np.clip(detections["bottom"] * height, 0, height)
+    return boxes
@@ -18,3 +18,33 @@ def normalize_img(
     if to_gray:
         img = np.reshape(img, [*img.shape, 1])
     return img
+
+
+def normalize_img_chw(
+    img: np.ndarray, out: np.ndarray, swap_rb: bool = False
+) -> np.ndarray:
+    """
+    Min-max normalize an HWC uint8 image to 0-1 and write it as CHW float32 into `out`.
+
+    Matches cv2.normalize(..., NORM_MINMAX, alpha=0, beta=1) followed by a move of
+    the channel axis, without allocating intermediate images.
+
+    Args:
+        img (np.ndarray): HWC image.
+        out (np.ndarray): Preallocated float32 array of shape (C, H, W).
+        swap_rb (bool): Reverse the channel order while writing (BGR <-> RGB).
+
+    Returns:
+        np.ndarray: `out`.
+    """
+    lo = img.min()
+    hi = img.max()
+    # cv2.normalize maps a constant image to alpha (0)
+    scale = 1.0 / (float(hi) - float(lo)) if hi > lo else 0.0
+
+    chw = img.transpose(2, 0, 1)
+    if swap_rb:
+        chw = chw[::-1]
+    np.subtract(chw, lo, out=out, dtype=np.float32)
+    np.multiply(out, scale, out=out)
+    return out
@@ -27,6 +27,10 @@ class StrLabelConverter(object):
         self.letters = letters
         self.letters_max = len(self.letters) + 1
         self.max_text_len = max_text_len
+        # Upper-case ASCII code of every label, 0 for the CTC blank
+        self.lookup_table = np.frombuffer(
+            b"\0" + self.letters.upper().encode("ascii"), dtype=np.uint8
+        )
 
     def labels_to_text(self, labels: List) -> str:
         out_best = [k for k, g in itertools.groupby(labels)]
@@ -51,16 +55,62 @@ def decode_prediction(logits: np.ndarray, label_converter: StrLabelConverter) ->
     return text
 
 
-def decode_batch(net_out_value: np.ndarray, label_converter: StrLabelConverter) -> list:
-    texts = []
-    batch_size = net_out_value.shape[0]  # First dimension is batch size
+def decode_batch(
+    net_out_value: np.ndarray,
+    label_converter: StrLabelConverter,
+    return_confidence: bool = False,
+):
+    """
+    Greedy CTC decoding of a whole batch at once.
+
+    Takes the argmax per time step, collapses repeated tokens and removes blanks
+    for all plates in a single set of NumPy operations; the softmax is only
+    computed when confidences are requested.
 
-    for i in range(batch_size):
-        logits = net_out_value[i]  # Extract logits for the current image in the batch
-        pred_texts = decode_prediction(logits, label_converter)
-        texts.append(pred_texts)
-    texts = [text.upper() for text in texts]
-    return texts
+    Args:
+        net_out_value (np.ndarray): Model output of shape (time steps, batch, classes).
+        label_converter (StrLabelConverter): Converter holding the alphabet.
+        return_confidence (bool): Also return per-character and per-plate confidence.
+
+    Returns:
+        list: Upper-cased plate texts. With return_confidence, a tuple
+        (texts, char_confidences, plate_confidences) where char_confidences is a
+        list of float32 arrays with the probability of every emitted character and
+        plate_confidences a float32 array with the lowest character probability
+        of each plate (0 for empty reads).
+    """
+    logits = np.asarray(net_out_value)
+    tokens = np.argmax(logits, axis=-1).T  # shape: (batch, time steps)
+    batch_size, time_steps = tokens.shape
+
+    # Keep the first token of every run that is not the blank (0)
+    keep = tokens != 0
+    keep[:, 1:] &= tokens[:, 1:] != tokens[:, :-1]
+
+    # Move the kept characters to the front of each row (stable, so order is kept);
+    # the trailing NUL padding is dropped by the fixed-width bytes view
+    order = np.argsort(~keep, axis=1, kind="stable")
+    chars = np.where(keep, label_converter.lookup_table[tokens], 0).astype(np.uint8)
+    chars = np.take_along_axis(chars, order, axis=1)
+    texts = [
+        text.decode("ascii")
+        for text in np.ascontiguousarray(chars).view(f"S{time_steps}").ravel()
+    ]
+    if not return_confidence:
+        return texts
+
+    # Softmax probability of the winning class at every time step:
+    # exp(max) / sum(exp(logits)) == 1 / sum(exp(logits - max))
+    shifted = logits - np.max(logits, axis=-1, keepdims=True)
+    step_probs = (1.0 / np.sum(np.exp(shifted), axis=-1)).T.astype(np.float32)
+
+    lengths = keep.sum(axis=1)
+    kept_probs = np.take_along_axis(step_probs, order, axis=1)
+    char_confidences = [kept_probs[i, : lengths[i]] for i in range(batch_size)]
+    plate_confidences = np.where(
+        lengths > 0, np.where(keep, step_probs, np.inf).min(axis=1), 0
+    ).astype(np.float32)
+    return texts, char_confidences, plate_confidences
 
 
 def is_valid_str(s: str, letters: List) -> bool:
@@ -0,0 +1,174 @@
+import hashlib
+import logging
+import os
+
+import onnxruntime as rt
+
+# Per-model sections of the engine.onnxruntime config
+MODEL_SECTIONS = ("detector", "ocr")
+
+EXECUTION_MODES = {
+    "sequential": rt.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": rt.ExecutionMode.ORT_PARALLEL,
+}
+
+OPTIMIZATION_LEVELS = {
+    "disable": rt.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": rt.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": rt.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": rt.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+# Highest level written to the optimized graph cache; "all" adds layout
+# optimizations for the CPU the session runs on, which are redone on every load
+CACHED_OPTIMIZATION_LEVEL = rt.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+
+
+def quantized_model_path(model_path):
+    """Path of the INT8 model quantize.py writes for `model_path` (model.onnx -> model.int8.onnx)."""
+    root, ext = os.path.splitext(model_path)
+    return f"{root}.int8{ext or '.onnx'}"
+
+
+def optimized_model_path(optimized_path, model_path, level, providers):
+    """
+    Path of the optimized graph cached for one model file and session setup.
+
+    A hash of the model file, the optimization level, the providers and the
+    ONNX Runtime version goes into the file name (model.opt.onnx ->
+    model.opt.<hash>.onnx), so changing any of them writes a new file
+    instead of loading a graph optimized for something else.
+    """
+    digest = hashlib.sha256()
+    with open(model_path, "rb") as f:
+        for chunk in iter(lambda: f.read(2**20), b""):
+            digest.update(chunk)
+    digest.update(f"{level}|{','.join(providers)}|{rt.__version__}".encode())
+    root, ext = os.path.splitext(optimized_path)
+    return f"{root}.{digest.hexdigest()[:16]}{ext or '.onnx'}"
+
+
+def model_session_config(config, model):
+    """
+    Session settings of one model from the `engine.onnxruntime` config section.
+
+    Top-level keys apply to every model; keys in the model's own section
+    ("detector" or "ocr") override them.
+
+    Args:
+        config (dict | None): The `engine.onnxruntime` section.
+        model (str): One of MODEL_SECTIONS.
+
+    Returns:
+        dict: Flat settings for create_session.
+    """
+    config = dict(config or {})
+    overrides = config.get(model) or {}
+    for section in MODEL_SECTIONS:
+        config.pop(section, None)
+    config.update(overrides)
+    return config
+
+
+def session_options(config):
+    """
+    Build rt.SessionOptions from a flat settings dict.
+
+    Supported keys: intra_op_num_threads, inter_op_num_threads, execution_mode
+    ("sequential" | "parallel"), graph_optimization_level ("disable" | "basic" |
+    "extended" | "all") and allow_spinning. Missing keys keep ONNX Runtime defaults.
+
+    Raises:
+        ValueError: On an unknown execution mode or optimization level.
+    """
+    options = rt.SessionOptions()
+    if config.get("intra_op_num_threads") is not None:
+        options.intra_op_num_threads = int(config["intra_op_num_threads"])
+    if config.get("inter_op_num_threads") is not None:
+        options.inter_op_num_threads = int(config["inter_op_num_threads"])
+    if config.get("execution_mode") is not None:
+        mode = str(config["execution_mode"]).lower()
+        if mode not in EXECUTION_MODES:
+            raise ValueError(f"Unknown ONNX Runtime execution mode: {mode}")
+        options.execution_mode = EXECUTION_MODES[mode]
+    if config.get("graph_optimization_level") is not None:
+        level = str(config["graph_optimization_level"]).lower()
+        if level not in OPTIMIZATION_LEVELS:
+            raise ValueError(f"Unknown ONNX Runtime optimization level: {level}")
+        options.graph_optimization_level = OPTIMIZATION_LEVELS[level]
+    if config.get("allow_spinning") is not None:
+        # Idle worker threads busy-wait for work unless spinning is disabled
+        spinning = "1" if config["allow_spinning"] else "0"
+        options.add_session_config_entry("session.intra_op.allow_spinning", spinning)
+        options.add_session_config_entry("session.inter_op.allow_spinning", spinning)
+    return options
+
+
+def create_session(model_path, config=None):
+    """
+    Create an rt.InferenceSession with the configured options and providers.
+
+    With `use_quantized` set, the INT8 model written by quantize.py next to
+    `model_path` is loaded instead when it exists.
+
+    With `optimized_model_filepath` set, the graph optimized on the first start
+    is serialized next to that path, see optimized_model_path, and loaded on
+    later starts without redoing the basic and extended optimizations. The
+    cached graph is optimized up to "extended" only; at level "all" the
+    layout optimizations for the CPU it runs on are applied on every load.
+
+    Args:
+        model_path (str): Path of the ONNX model.
+        config (dict, optional): Flat settings, see session_options; may also
+            contain `providers`, `use_quantized` and `optimized_model_filepath`.
+
+    Returns:
+        rt.InferenceSession: The created session.
+    """
+    config = config or {}
+    options = session_options(config)
+    providers = config.get("providers")
+
+    optimized_path = config.get("optimized_model_filepath")
+    if config.get("use_quantized"):
+        quantized_path = quantized_model_path(model_path)
+        if os.path.isfile(quantized_path):
+            logging.info(f"[ORT] Using quantized model {quantized_path}")
+            model_path = quantized_path
+            if optimized_path:
+                # Keep the optimized FP32 and INT8 graphs apart
+                optimized_path = quantized_model_path(optimized_path)
+        else:
+            logging.warning(
+                f"[ORT] No quantized model at {quantized_path}, using {model_path}"
+            )
+
+    if optimized_path:
+        level = options.graph_optimization_level
+        optimized_path = optimized_model_path(
+            optimized_path,
+            model_path,
+            level,
+            providers or rt.get_available_providers(),
+        )
+        if not os.path.isfile(optimized_path):
+            logging.info(f"[ORT] Saving optimized model to {optimized_path}")
+            directory = os.path.dirname(optimized_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            save_options = session_options(config)
+            if level == rt.GraphOptimizationLevel.ORT_ENABLE_ALL:
+                save_options.graph_optimization_level = CACHED_OPTIMIZATION_LEVEL
+            # Renamed once complete, so a crash never leaves a truncated graph behind
+            partial_path = f"{optimized_path}.{os.getpid()}.tmp"
+            save_options.optimized_model_filepath = partial_path
+            rt.InferenceSession(
+                model_path, sess_options=save_options, providers=providers
+            )
+            os.replace(partial_path, optimized_path)
+        logging.info(f"[ORT] Loading optimized model {optimized_path}")
+        if level != rt.GraphOptimizationLevel.ORT_ENABLE_ALL:
+            options.graph_optimization_level = rt.GraphOptimizationLevel.ORT_DISABLE_ALL
+        model_path = optimized_path
+
+    return rt.InferenceSession(model_path, sess_options=options, providers=providers)
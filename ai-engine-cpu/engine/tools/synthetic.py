@@ -0,0 +1,275 @@
+import string
+
+import cv2
+import numpy as np
+
+from engine.camera import Region
+
+# Characters the OCR model knows, see Ocr.letters
+PLATE_CHARACTERS = string.digits + string.ascii_uppercase
+
+# Plate size in pixels at 1080p, as seen by a gate camera
+PLATE_WIDTHS = (110, 220)
+PLATE_ASPECT = 4.5
+
+PLATE_COLORS = ((255, 255, 255), (235, 240, 245), (40, 200, 240))  # BGR
+
+
+def random_plate_text(rng):
+    """Plate text of two letters, then two letters or digits and three digits."""
+    letters = string.ascii_uppercase
+    alnum = PLATE_CHARACTERS
+    return (
+        "".join(rng.choice(list(letters), 2))
+        + "".join(rng.choice(list(alnum), 2))
+        + "".join(rng.choice(list(string.digits), 3))
+    )
+
+
+def render_plate(text, rng, width=300, height=None):
+    """
+    Render a plate with a border and black text filling most of it.
+
+    Args:
+        text (str): Plate text.
+        rng (np.random.Generator): Source of the color, blur and noise.
+        width (int): Plate width in pixels.
+        height (int, optional): Plate height, width / PLATE_ASPECT by default.
+
+    Returns:
+        np.ndarray: BGR plate image.
+    """
+    height = height or max(8, round(width / PLATE_ASPECT))
+    color = PLATE_COLORS[rng.integers(len(PLATE_COLORS))]
+    plate = np.empty((height, width, 3), dtype=np.uint8)
+    plate[:] = color
+    border = max(1, height // 20)
+    cv2.rectangle(plate, (0, 0), (width - 1, height - 1), (20, 20, 20), border)
+
+    # Largest font scale that fits the text into the plate with a margin
+    font = cv2.FONT_HERSHEY_DUPLEX
+    thickness = max(1, height // 12)
+    (text_width, text_height), _ = cv2.getTextSize(text, font, 1.0, thickness)
+    scale = min(0.88 * width / text_width, 0.62 * height / text_height)
+    (text_width, text_height), _ = cv2.getTextSize(text, font, scale, thickness)
+    origin = ((width - text_width) // 2, (height + text_height) // 2)
+    cv2.putText(plate, text, origin, font, scale, (15, 15, 15), thickness, cv2.LINE_AA)
+
+    noise = rng.normal(0, 6, plate.shape)
+    plate = np.clip(plate + noise, 0, 255).astype(np.uint8)
+    if width > 60:
+        plate = cv2.GaussianBlur(plate, (3, 3), 0)
+    return plate
+
+
+def render_background(width, height, rng):
+    """Road-like background: a vertical gradient, a few car-sized blocks and noise."""
+    top, bottom = rng.integers(60, 200, 2)
+    column = np.linspace(top, bottom, height, dtype=np.float32)[:, None, None]
+    background = np.broadcast_to(column, (height, width, 3)).copy()
+    for _ in range(rng.integers(2, 6)):
+        x, y = rng.integers(0, width), rng.integers(0, height)
+        w, h = rng.integers(width // 10, width // 3), rng.integers(
+            height // 10, height // 3
+        )
+        background[y : y + h, x : x + w] = rng.integers(0, 256, 3)
+    background += rng.normal(0, 4, (height, width, 1))
+    return np.clip(background, 0, 255).astype(np.uint8)
+
+
+def place_plate(rng, rect, frame_height):
+    """Random plate box inside an (x1, y1, x2, y2) region, None if it does not fit."""
+    x1, y1, x2, y2 = rect
+    scale = frame_height / 1080
+    width = round(rng.uniform(*PLATE_WIDTHS) * scale)
+    width = min(width, x2 - x1 - 2)
+    height = round(width / PLATE_ASPECT)
+    if width < 20 or height > y2 - y1 - 2:
+        return None
+    x = int(rng.integers(x1, x2 - width))
+    y = int(rng.integers(y1, y2 - height))
+    return x, y, x + width, y + height
+
+
+def render_scene(regions, rng, width=1920, height=1080, background=None):
+    """
+    Render a frame with one plate in each region.
+
+    Args:
+        regions (list): (name, (x1, y1, x2, y2)) of every region, in pixels.
+        rng (np.random.Generator): Source of the scene.
+        width, height (int): Frame size.
+        background (np.ndarray, optional): Frame to draw on, a random one by default.
+
+    Returns:
+        tuple: (BGR frame, ground truth) where the ground truth lists a dict
+        with text, box (x1, y1, x2, y2) and region of every plate.
+    """
+    frame = (
+        render_background(width, height, rng)
+        if background is None
+        else background.copy()
+    )
+    truth = []
+    for name, rect in regions:
+        box = place_plate(rng, rect, height)
+        if box is None:
+            continue
+        text = random_plate_text(rng)
+        x1, y1, x2, y2 = box
+        frame[y1:y2, x1:x2] = render_plate(text, rng, x2 - x1, y2 - y1)
+        truth.append({"text": text, "box": list(box), "region": name})
+    return frame, truth
+
+
+def render_passes(regions, rng, frames, width=1920, height=1080, frames_per_pass=50):
+    """
+    Frames of plates driving through the regions, for tracking and video tests.
+
+    Every region sees one plate at a time, moving down through the region
+    over frames_per_pass frames before the next plate enters.
+
+    Yields:
+        tuple: (BGR frame, ground truth) as from render_scene.
+    """
+    background = render_background(width, height, rng)
+    passes = {}
+    for index in range(frames):
+        frame = background.copy()
+        truth = []
+        for name, (x1, y1, x2, y2) in regions:
+            current = passes.get(name)
+            if current is None or index - current["start"] >= frames_per_pass:
+                box = place_plate(rng, (x1, y1, x2, y2), height)
+                if box is None:
+                    continue
+                text = random_plate_text(rng)
+                current = passes[name] = {
+                    "start": index,
+                    "text": text,
+                    "box": box,
+                    "plate": render_plate(text, rng, box[2] - box[0], box[3] - box[1]),
+                }
+            px1, _, px2, _ = current["box"]
+            plate = current["plate"]
+            # Top to bottom through the region
+            progress = (index - current["start"]) / max(1, frames_per_pass - 1)
+            py1 = round(y1 + progress * (y2 - y1 - plate.shape[0]))
+            py2 = py1 + plate.shape[0]
+            frame[py1:py2, px1:px2] = plate
+            truth.append(
+                {"text": current["text"], "box": [px1, py1, px2, py2], "region": name}
+            )
+        yield frame, truth
+
+
+def camera_regions(camera_config):
+    """(name, (x1, y1, x2, y2)) of the regions of a `camera:` config entry, in image_size pixels."""
+    regions = [Region.from_config(region) for region in camera_config["regions"]]
+    return [(r.name, (r.x1, r.y1, r.x2, r.y2)) for r in regions]
+
+
+def _save_model(nodes, initializers, inputs, outputs, path):
+    # onnx is only needed to build the stand-in models, not by the engine
+    import onnx
+    from onnx import helper
+
+    graph = helper.make_graph(nodes, "synthetic", inputs, outputs, initializers)
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.checker.check_model(model)
+    onnx.save(model, path)
+
+
+def write_tiny_detector(path, rng):
+    """
+    Randomly initialized stand-in for the plate detector.
+
+    Same interface as the real model: an (N, 3, 300, 300) input, softmax scores
+    of shape (N, 3000, 2) and valid normalized (left, top, right, bottom) boxes
+    of shape (N, 3000, 4). The detections are meaningless, the run time is a
+    small fraction of the real model's.
+    """
+    from onnx import TensorProto, helper, numpy_helper
+
+    def constant(name, values, dtype=np.int64):
+        return numpy_helper.from_array(np.asarray(values, dtype=dtype), name)
+
+    initializers = [
+        constant("weights", rng.normal(0, 0.05, (20, 3, 10, 10)), np.float32),
+        constant("shape", [0, 3000, 6]),
+        constant("axis", [2]),
+        constant("start_scores", [0]),
+        constant("start_centers", [2]),
+        constant("start_sizes", [4]),
+        constant("end", [6]),
+        constant("half", [0.25], np.float32),
+    ]
+    nodes = [
+        # (N, 20, 30, 30) features, 3000 anchors of 6 values each
+        helper.make_node(
+            "Conv", ["input_0", "weights"], ["features"], strides=[10, 10]
+        ),
+        helper.make_node("Reshape", ["features", "shape"], ["anchors"]),
+        helper.make_node(
+            "Slice", ["anchors", "start_scores", "start_centers", "axis"], ["logits"]
+        ),
+        helper.make_node("Softmax", ["logits"], ["scores"], axis=-1),
+        helper.make_node("Sigmoid", ["anchors"], ["unit"]),
+        helper.make_node(
+            "Slice", ["unit", "start_centers", "start_sizes", "axis"], ["centers"]
+        ),
+        helper.make_node("Slice", ["unit", "start_sizes", "end", "axis"], ["sizes"]),
+        # Half sizes up to a quarter of the image
+        helper.make_node("Mul", ["sizes", "half"], ["half_sizes"]),
+        helper.make_node("Sub", ["centers", "half_sizes"], ["top_left"]),
+        helper.make_node("Add", ["centers", "half_sizes"], ["bottom_right"]),
+        helper.make_node("Concat", ["top_left", "bottom_right"], ["boxes"], axis=2),
+    ]
+    _save_model(
+        nodes,
+        initializers,
+        [
+            helper.make_tensor_value_info(
+                "input_0", TensorProto.FLOAT, ["N", 3, 300, 300]
+            )
+        ],
+        [
+            helper.make_tensor_value_info("scores", TensorProto.FLOAT, ["N", 3000, 2]),
+            helper.make_tensor_value_info("boxes", TensorProto.FLOAT, ["N", 3000, 4]),
+        ],
+        path,
+    )
+
+
+def write_tiny_ocr(path, rng):
+    """
+    Randomly initialized stand-in for the OCR model.
+
+    Takes (N, 3, 50, 200) plate crops and returns (13, N, 37) character
+    scores like the real model, so CTC decoding runs on the usual shapes.
+    """
+    from onnx import TensorProto, helper, numpy_helper
+
+    initializers = [
+        numpy_helper.from_array(
+            rng.normal(0, 0.05, (len(PLATE_CHARACTERS) + 1, 3, 50, 8)).astype(
+                np.float32
+            ),
+            "weights",
+        ),
+        numpy_helper.from_array(np.array([2], dtype=np.int64), "axis"),
+    ]
+    nodes = [
+        # One column of 37 scores every 15 pixels: (N, 37, 1, 13)
+        helper.make_node("Conv", ["input", "weights"], ["features"], strides=[1, 15]),
+        helper.make_node("Squeeze", ["features", "axis"], ["columns"]),
+        helper.make_node("Transpose", ["columns"], ["output"], perm=[2, 0, 1]),
+    ]
+    _save_model(
+        nodes,
+        initializers,
+        [helper.make_tensor_value_info("input", TensorProto.FLOAT, ["N", 3, 50, 200])],
+        [helper.make_tensor_value_info("output", TensorProto.FLOAT, [13, "N", 37])],
+        path,
+    )
@@ -0,0 +1,313 @@
+import itertools
+
+import numpy as np
+
+from engine.consensus import PlateConsensus
+from engine.tools.detection_tools import box_iou_matrix
+
+# Track lifecycle states
+TENTATIVE = "tentative"  # Seen fewer than min_hits times
+CONFIRMED = "confirmed"  # Matched in the current frame
+LOST = "lost"  # Missed in recent frames, kept alive by the motion model
+DELETED = "deleted"  # Missed for more than max_age frames
+
+# Track IDs are unique across all cameras of the process
+_track_ids = itertools.count(1)
+
+
+class KalmanBoxFilter:
+    """
+    Constant-velocity Kalman filter over a box (center x, center y, width, height).
+
+    Process and measurement noise scale with the box size, so the filter behaves
+    the same for plates near and far from the camera.
+
+    Args:
+        box: (x_min, y_min, x_max, y_max) of the first detection.
+    """
+
+    _F = np.eye(8)
+    _F[:4, 4:] = np.eye(4)  # x += v, one step per processed frame
+    _H = np.eye(4, 8)
+
+    # Noise standard deviations relative to the box size
+    _STD_POSITION = 1.0 / 20
+    _STD_VELOCITY = 1.0 / 160
+
+    def __init__(self, box):
+        z = self._measurement(box)
+        self.x = np.concatenate([z, np.zeros(4)])
+        size = np.tile(z[2:], 2)  # (w, h, w, h)
+        std = np.concatenate(
+            [2 * self._STD_POSITION * size, 10 * self._STD_VELOCITY * size]
+        )
+        self.P = np.diag(np.square(std))
+
+    @staticmethod
+    def _measurement(box):
+        x_min, y_min, x_max, y_max = box
+        return np.array(
+            [(x_min + x_max) / 2, (y_min + y_max) / 2, x_max - x_min, y_max - y_min],
+            dtype=np.float64,
+        )
+
+    def _size(self):
+        return np.tile(np.maximum(self.x[2:4], 1.0), 2)
+
+    def predict(self):
+        """Advance the state by one frame."""
+        size = self._size()
+        q = np.square(
+            np.concatenate([self._STD_POSITION * size, self._STD_VELOCITY * size])
+        )
+        self.x = self._F @ self.x
+        self.P = self._F @ self.P @ self._F.T + np.diag(q)
+
+    def update(self, box):
+        """Correct the state with a matched detection."""
+        r = np.square(self._STD_POSITION * self._size())
+        S = self._H @ self.P @ self._H.T + np.diag(r)
+        K = self.P @ self._H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ (self._measurement(box) - self._H @ self.x)
+        self.P = (np.eye(8) - K @ self._H) @ self.P
+
+    @property
+    def box(self):
+        """Current (x_min, y_min, x_max, y_max) estimate."""
+        cx, cy, w, h = self.x[:4]
+        w, h = max(w, 0.0), max(h, 0.0)
+        return np.array([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2])
+
+
+class Track:
+    """
+    One plate followed across frames.
+
+    Attributes:
+        id (int): Track ID, unique within the process.
+        state (str): TENTATIVE, CONFIRMED, LOST or DELETED.
+        box (np.ndarray): Last detected (x_min, y_min, x_max, y_max) box.
+        region (int): Region index of the last detection.
+        hits (int): Number of frames the plate was detected in.
+        misses (int): Consecutive frames without a detection.
+        first_seen, last_seen (float): Timestamps of the first and last detection.
+        consensus (PlateConsensus): Vote over the OCR reads of the plate.
+        last_read (float): Timestamp of the last OCR run, None before the first.
+        published_text (str): Last text published for this track.
+    """
+
+    __slots__ = (
+        "id",
+        "state",
+        "box",
+        "region",
+        "hits",
+        "misses",
+        "first_seen",
+        "last_seen",
+        "consensus",
+        "last_read",
+        "published_text",
+        "kalman",
+    )
+
+    def __init__(self, box, region, timestamp, consensus):
+        self.id = next(_track_ids)
+        self.state = TENTATIVE
+        self.box = np.asarray(box)
+        self.region = region
+        self.hits = 1
+        self.misses = 0
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.consensus = consensus
+        self.last_read = None
+        self.published_text = None
+        self.kalman = KalmanBoxFilter(box)
+
+    @property
+    def text(self):
+        """Consensus text of the reads so far ("" before the first read)."""
+        return self.consensus.text
+
+    @property
+    def final(self):
+        """True once the reads agree on the plate."""
+        return self.consensus.final
+
+    @property
+    def duration(self):
+        """Seconds between the first and the last detection."""
+        return self.last_seen - self.first_seen
+
+
+class PlateTracker:
+    """
+    IoU tracker with a Kalman motion model, so every plate is read once per visit.
+
+    Every frame the tracks are advanced by their motion model and greedily
+    matched to the new detections by IoU; unmatched detections start new tracks
+    and tracks missed for more than max_age frames are deleted. The tracker also
+    decides when a track needs OCR: on every frame until the PlateConsensus of
+    its reads is final, and again every revalidate_interval seconds after that.
+
+    Args:
+        iou_threshold (float): Minimum IoU between a predicted track box and a detection.
+        max_age (int): Frames a track is kept without detections.
+        min_hits (int): Detections needed before a track is confirmed.
+        revalidate_interval (float): Seconds between OCR runs on an already read track.
+        consensus_config (dict, optional): `engine.consensus` settings of every
+            track's PlateConsensus.
+    """
+
+    def __init__(
+        self,
+        iou_threshold=0.3,
+        max_age=15,
+        min_hits=1,
+        revalidate_interval=5.0,
+        consensus_config=None,
+    ):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.revalidate_interval = revalidate_interval
+        self.consensus_config = consensus_config
+
+        self.tracks = []
+        # Tracks deleted by the last update
+        self.removed = []
+        # Snapshot of pending_regions() set by TrackStage after every update,
+        # replaced as a whole so the capture side can read it while tracks change
+        self.pending = frozenset()
+
+    @classmethod
+    def from_config(cls, config, consensus_config=None):
+        """Build a tracker from the optional `engine.tracker` and `engine.consensus` sections."""
+        config = config or {}
+        return cls(
+            iou_threshold=config.get("iou_threshold", 0.3),
+            max_age=config.get("max_age", 15),
+            min_hits=config.get("min_hits", 1),
+            revalidate_interval=config.get("revalidate_interval", 5.0),
+            consensus_config=consensus_config,
+        )
+
+    def update(self, boxes, regions, timestamp, regions_checked=None):
+        """
+        Match the detections of a frame to the tracks.
+
+        Args:
+            boxes (np.ndarray): Detected (x_min, y_min, x_max, y_max) boxes, shape (N, 4).
+            regions (np.ndarray): Region index of every detection, shape (N,).
+            timestamp (float): Capture time of the frame.
+            regions_checked (set, optional): Regions detection ran on. Tracks in
+                other regions are paused: not moved, matched or aged. None means all.
+
+        Returns:
+            list: The Track of every detection, in the order of `boxes`.
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        active = [
+            track
+            for track in self.tracks
+            if regions_checked is None or track.region in regions_checked
+        ]
+        for track in active:
+            track.kalman.predict()
+
+        matches = self._match(active, boxes)
+        result = [None] * len(boxes)
+        for track_index, box_index in matches:
+            track = active[track_index]
+            track.kalman.update(boxes[box_index])
+            track.box = boxes[box_index]
+            track.region = int(regions[box_index])
+            track.hits += 1
+            track.misses = 0
+            track.last_seen = timestamp
+            result[box_index] = track
+
+        matched_tracks = {track_index for track_index, _ in matches}
+        for track_index, track in enumerate(active):
+            if track_index not in matched_tracks:
+                track.misses += 1
+
+        for box_index, track in enumerate(result):
+            if track is None:
+                track = Track(
+                    boxes[box_index],
+                    int(regions[box_index]),
+                    timestamp,
+                    PlateConsensus.from_config(self.consensus_config),
+                )
+                self.tracks.append(track)
+                result[box_index] = track
+
+        self.removed = []
+        alive = []
+        for track in self.tracks:
+            if track.misses > self.max_age:
+                track.state = DELETED
+                self.removed.append(track)
+                continue
+            if track.misses:
+                if track.state != TENTATIVE:
+                    track.state = LOST
+            elif track.hits >= self.min_hits:
+                track.state = CONFIRMED
+            alive.append(track)
+        # Tentative tracks missed once are most likely false positives
+        self.tracks = [
+            track for track in alive if not (track.state == TENTATIVE and track.misses)
+        ]
+        return result
+
+    def _match(self, tracks, boxes):
+        """Greedy IoU matching of predicted track boxes to detections."""
+        if not tracks or not len(boxes):
+            return []
+        predicted = np.stack([track.kalman.box for track in tracks])
+        ious = box_iou_matrix(predicted, boxes)
+
+        # Candidate pairs above the threshold, visited from the highest IoU down
+        track_indices, box_indices = np.nonzero(ious >= self.iou_threshold)
+        order = np.argsort(ious[track_indices, box_indices], kind="stable")[::-1]
+
+        matches = []
+        used_tracks, used_boxes = set(), set()
+        for track_index, box_index in zip(
+            track_indices[order].tolist(), box_indices[order].tolist()
+        ):
+            if track_index in used_tracks or box_index in used_boxes:
+                continue
+            used_tracks.add(track_index)
+            used_boxes.add(box_index)
+            matches.append((track_index, box_index))
+        return matches
+
+    def pending_regions(self):
+        """Regions with a confirmed track whose reads do not agree yet."""
+        return {
+            track.region
+            for track in self.tracks
+            if track.state == CONFIRMED and not track.final
+        }
+
+    def needs_ocr(self, track, timestamp):
+        """
+        Whether the plate of `track` should be read in this frame.
+
+        True for confirmed tracks whose reads do not agree yet, and for tracks
+        with a final read whose last read is older than revalidate_interval.
+        """
+        if track.state != CONFIRMED:
+            return False
+        if not track.final or track.last_read is None:
+            return True
+        return timestamp - track.last_read >= self.revalidate_interval
+
+    def record_read(self, track, text, char_confidences, timestamp):
+        """Add an OCR result to the consensus of `track`."""
+        track.consensus.add(text, char_confidences)
+        track.last_read = timestamp
@@ -1,13 +1,31 @@
 import sys
 from engine.utils import load_config
-import time
 import logging
+import threading
+import time
 import cv2
 from engine.pipes.object_detectors.base.lp import LicensePlateDetector
 from engine.pipes.number_plate_text_readers.base.ocr import Ocr
 
 from logger.logger import init_logger
 from engine.mqtt import MQTTEngine
+from engine.capture import FrameGrabber
+from engine.shared_capture import ProcessFrameGrabber
+from engine.camera import Camera
+from engine.tracker import PlateTracker
+from engine.motion import MotionGate
+from engine.metrics import EngineMetrics, MetricsServer, Registry
+from engine.inference_pool import InferencePool, fork_safe_session_config
+from engine.pipeline import Pipeline
+from engine.stages import (
+    ConsensusStage,
+    DetectStage,
+    OcrStage,
+    PublishStage,
+    TrackStage,
+    gate_frame,
+)
+from engine.tools.onnx_tools import model_session_config
 
 try:
     # Load configuration
@@ -33,13 +51,47 @@ init_logger(
     logging_level=log_level,
     print_to_stdout=config["logging"]["print_to_stdout"],
     log_in_file=config["logging"]["log_in_file"],
+    max_file_size_mb=config["logging"].get("max_file_size_mb", 10),
+    backup_count=config["logging"].get("backup_count", 5),
+    rotate_hours=config["logging"].get("rotate_hours", 24),
+    rate_limit_seconds=config["logging"].get("rate_limit_seconds", 60),
 )
 
-# Extract camera configuration
-camera_config = config["camera"][0]
-input_image_width = camera_config["image_size"]["width"]
-input_image_height = camera_config["image_size"]["height"]
-camera_regions = camera_config["regions"]
+# ONNX Runtime session settings, shared by both models unless overridden
+onnxruntime_config = config["engine"].get("onnxruntime")
+
+# Detection, tracking, OCR and publishing run as overlapping pipeline stages
+pipeline_config = config["engine"].get("pipeline") or {}
+# Inference in forked worker processes, off unless configured
+processes = pipeline_config.get("processes", 0)
+
+
+def session_config(model):
+    """ONNX Runtime settings of a model, single-threaded when workers are forked."""
+    model_config = model_session_config(onnxruntime_config, model)
+    return fork_safe_session_config(model_config) if processes else model_config
+
+
+logging.debug("[OCR] Initializing OCR model...")
+ocr = Ocr()
+logging.debug("[OCR] Initializing OCR model - DONE.")
+
+logging.debug("[OCR] Initializing label converter...")
+ocr.init_label_converter()
+logging.debug("[OCR] Initializing label converter - DONE.")
+logging.debug("[OCR] Initializing weights...")
+ocr.load_model(config["engine"]["ocr_model"], session_config("ocr"))
+logging.debug("[OCR] Initializing weights - DONE.")
+
+# Load the object detection network
+net = LicensePlateDetector(config["engine"])
+net.load_model(config["engine"]["model"], session_config("detector"))
+
+inference_pool = None
+if processes:
+    # Fork before any other thread starts; the workers share the loaded weights
+    inference_pool = InferencePool(net, ocr, processes)
+    inference_pool.start()
 
 # MQTT configuration
 mqtt_config = {
@@ -55,160 +107,202 @@ mqtt_config = {
         "cert": config["mqtt"]["tls"]["cert"],
         "key": config["mqtt"]["tls"]["key"],
     },
+    "reconnect_delay": config["mqtt"].get("reconnect_delay"),
+    "outbox": config["mqtt"].get("outbox"),
 }
 mqtt_engine = MQTTEngine(mqtt_config)
 mqtt_engine.client.tls_insecure_set(True)
-mqtt_engine.connect()
-mqtt_engine.client.loop_start()
-
-logging.debug("[OCR] Initializing OCR model...")
-ocr = Ocr()
-logging.debug("[OCR] Initializing OCR model - DONE.")
-
-logging.debug("[OCR] Initializing label converter...")
-ocr.init_label_converter()
-logging.debug("[OCR] Initializing label converter - DONE.")
-logging.debug("[OCR] Initializing weights...")
-ocr.load_model(config["engine"]["ocr_model"])
-logging.debug("[OCR] Initializing weights - DONE.")
-
-# Load the object detection network
-net = LicensePlateDetector(config["engine"])
-net.load_model(config["engine"]["model"])
-
-try:
-    input_stream = cv2.VideoCapture(config["camera"][0]["input_stream"])
-except Exception as e:
-    logging.error(f"Could not connect to video source: {e}")
-    sys.exit(1)
-if not input_stream.isOpened():
-    logging.error(f"Could not open RTSP stream: {config['camera'][0]['input_stream']}")
-    sys.exit(1)
 
 # Max retries configuration
 max_retries = config["engine"].get(
     "max_retries", 5
 )  # Default to 5 retries if not specified in the config
 
-# Initialize retry counter
-retry_counter = 0
+# Motion gating of the detector, off unless configured
+motion_config = config["engine"].get("motion") or {}
 
-# process frames until the user exits
-while True:
+# Decode in a separate process per camera instead of a thread, off unless configured
+capture_config = config["engine"].get("capture") or {}
+
+# Latency histograms and counters, served in the Prometheus text format when enabled
+metrics_config = config["engine"].get("metrics") or {}
+metrics = EngineMetrics(Registry())
+metrics.watch_mqtt(mqtt_engine)
+
+
+def finish_job(job):
+    """Release the frame of a job leaving the pipeline and count its results."""
+    job.release()
+    metrics.frame_latency.observe(time.monotonic() - job.timestamp)
+    if job.detections is not None:
+        metrics.detections.labels(job.camera.id).inc(len(job.detections))
+    if job.texts:
+        metrics.reads.labels(job.camera.id).inc(len(job.texts))
+
+
+# Every frame passes detection, tracking, OCR, consensus and publishing stages
+queue_size = pipeline_config.get("queue_size", 1)
+detector, reader = net, ocr
+detect_workers = pipeline_config.get("detect_workers", 1)
+ocr_workers = pipeline_config.get("ocr_workers", 1)
+if inference_pool is not None:
+    # One stage thread per worker process keeps all of them busy
+    detector, reader = inference_pool.detector, inference_pool.ocr
+    detect_workers = ocr_workers = processes
+pipeline = Pipeline(
+    [
+        DetectStage(detector, workers=detect_workers, queue_size=queue_size),
+        TrackStage(queue_size=queue_size),
+        OcrStage(reader, workers=ocr_workers, queue_size=queue_size),
+        ConsensusStage(queue_size=queue_size),
+        PublishStage(mqtt_engine, queue_size=queue_size),
+    ],
+    # Frames skipped or dropped on the way hand their buffer back here
+    on_exit=finish_job,
+    stage_latency=metrics.stage_latency,
+)
+
+# One capture worker per camera, all of them feeding the shared detector and OCR
+frame_ready = threading.Event()
+cameras = []
+for camera_config in config["camera"]:
+    if capture_config.get("process", False):
+        grabber = ProcessFrameGrabber(
+            camera_config["input_stream"],
+            name=str(camera_config.get("id", len(cameras))),
+            max_retries=max_retries,
+            notify=frame_ready,
+            slots=capture_config.get("slots", 6),
+        )
+    else:
+        grabber = FrameGrabber(
+            camera_config["input_stream"],
+            name=str(camera_config.get("id", len(cameras))),
+            max_retries=max_retries,
+            notify=frame_ready,
+            pool_size=capture_config.get("slots", 6),
+        )
     try:
-        # capture the next image
-        ret, raw_img = input_stream.read()
-        if not ret:
-            logging.error("Failed to capture frame from RTSP stream.")
-            raise ValueError("Failed to capture frame from RTSP stream.")
-
-        logging.debug(f"Captured image type: {type(raw_img)}")
-        logging.debug(f"Captured image attributes: {dir(raw_img)}")
-
-        raw_img = cv2.resize(raw_img, (input_image_width, input_image_height))
-        retry_counter = 0  # Reset counter on success
-    except ValueError as e:
-        logging.warning("Attempting to reconnect to RTSP stream...")
-        input_stream.release()  # Clean up the old stream
-        input_stream = cv2.VideoCapture(config["camera"][0]["input_stream"])
-        
-        if not input_stream.isOpened():
-            logging.error(f"Could not reconnect to RTSP stream: {config['camera'][0]['input_stream']}")
-            sys.exit(1)
-        
-        retry_counter += 1
-        if retry_counter > max_retries:
-            mqtt_message = {
-                "error": "Max retries exceeded",
-                "message": f"Error capturing and processing image: {e}",
-            }
-            mqtt_engine.publish(mqtt_message, "alpr/ai-engine/error")
-            # Send your MQTT message or handle the error accordingly
-            logging.error("Max retries exceeded. Exiting...")
-            sys.exit(1)
-        time.sleep(5)  # Short delay before the next attempt
-        continue
+        # Threads start once every capture process is forked, see ProcessFrameGrabber
+        grabber.open()
     except Exception as e:
-        logging.error(f"Unexpected error: {e}")
-        retry_counter += 1
-        if retry_counter > max_retries:
-            mqtt_message = {
-                "error": "Max retries exceeded",
-                "message": f"Unexpected error capturing and processing image: {e}",
-            }
-            mqtt_engine.publish(mqtt_message, "alpr/ai-engine/error")
-            logging.error("Max retries exceeded. Exiting...")
-            sys.exit(1)
-        time.sleep(5)  # Short delay before the next attempt
-        continue
-
-    # Extract regions based on the configuration
-    for region in camera_regions:
+        logging.error(f"Could not connect to video source: {e}")
+        sys.exit(1)
+    camera = Camera(
+        camera_config,
+        grabber,
+        tracker=PlateTracker.from_config(
+            config["engine"].get("tracker"), config["engine"].get("consensus")
+        ),
+    )
+    if motion_config and motion_config.get("enabled", True):
+        camera.motion_gates = [
+            MotionGate.from_config(motion_config) for _ in camera.regions
+        ]
+    cameras.append(camera)
+grabbers = [camera.grabber for camera in cameras]
+for grabber in grabbers:
+    grabber.start()
+metrics.watch_grabbers(list(cameras))
+
+# The MQTT network thread starts only after the capture processes are forked
+mqtt_engine.connect()
+mqtt_engine.client.loop_start()
+
+metrics_server = None
+if metrics_config.get("enabled", False):
+    metrics_server = MetricsServer(
+        metrics.registry,
+        host=metrics_config.get("host", "127.0.0.1"),
+        port=metrics_config.get("port", 9100),
+    )
+    try:
+        metrics_server.start()
+    except OSError as e:
+        logging.error(f"Could not start the metrics endpoint: {e}")
+        metrics_server = None
+
+# process frames until the user exits
+pipeline.start()
+while cameras:
+    if inference_pool is not None and inference_pool.failed:
+        mqtt_engine.publish(
+            {
+                "error": "Inference failed",
+                "message": f"Inference worker pool failed: {inference_pool.error}",
+            },
+            "alpr/ai-engine/error",
+        )
+        logging.error("Inference worker pool failed. Exiting...")
+        break
+
+    frame_ready.clear()
+    processed = False
+    for camera in list(cameras):
+        frame = camera.grabber.read(timeout=0)
+        if frame is None:
+            if camera.grabber.failed:
+                mqtt_message = {
+                    "error": "Max retries exceeded",
+                    "message": f"Error capturing and processing image: {camera.grabber.error}",
+                    "cameraId": camera.id,
+                }
+                mqtt_engine.publish(mqtt_message, "alpr/ai-engine/error")
+                logging.error(f"Max retries exceeded on camera {camera.id}.")
+                # Stopped after the pipeline, which may still hold its frames
+                cameras.remove(camera)
+            continue
+
+        logging.debug(
+            "[CAP] Camera %s frame %d age %.1f ms, dropped %d of %d frames",
+            camera.id,
+            frame.seq,
+            frame.age * 1000,
+            camera.grabber.frames_dropped,
+            camera.grabber.frames_captured,
+        )
+        metrics.frames.labels(camera.id).inc()
+        metrics.capture_latency.labels(camera.id).observe(frame.age)
+
+        time_start = time.perf_counter()
         try:
-            name = region["name"]
-            coords = region["coordinates"]
-
-            # Extract the top-left and bottom-right coordinates
-            x1, y1 = coords[0]["x"], coords[0]["y"]
-            x2, y2 = coords[2]["x"], coords[2]["y"]
-
-            # Crop the region from the resized image
-            region_img = raw_img[y1:y2, x1:x2, :]
-
-            # detect objects in the image (with overlay)
-            image_data = net.preprocess(region_img)
-            detections = net.predict(image_data)
-            # print the detections
-            logging.debug(
-                "[DET] Detected {:d} objects in region {}".format(len(detections), name)
-            )
-
-            for i, detection in enumerate(detections):
-                try:
-                    x_min = int(detection.Left * region_img.shape[1])
-                    x_max = int(detection.Right * region_img.shape[1])
-                    y_max = int(detection.Bottom * region_img.shape[0])
-                    y_min = int(detection.Top * region_img.shape[0])
-
-                    cropped_img = region_img[y_min:y_max, x_min:x_max, :]
-                    cropped_img = cv2.resize(cropped_img, (300, 100))
-                    cropped_img = cv2.cvtColor(cropped_img, cv2.COLOR_BGR2RGB)
-                    logging.debug("[OCR] Preprocessing image.")
-                    xs = ocr.preprocess([cropped_img])
-                    logging.debug("[OCR] Image preprocessed.")
-                    logging.debug("[OCR] Predicting.")
-                    license_plate_text = ocr.predict(xs)[0]
-                    logging.debug("[OCR] Predicted: {}".format(license_plate_text))
-
-                    data = {}
-                    data["licensePlate"] = license_plate_text
-                    mqtt_engine.publish(data, "alpr/ramp/req")
-                    # Draw the detection and text on the full-sized raw_img
-                    cv2.rectangle(
-                        raw_img,
-                        (x_min + x1, y_min + y1),
-                        (x_max + x1, y_max + y1),
-                        (0, 255, 0),
-                        2,
-                    )
-                    cv2.putText(
-                        raw_img,
-                        license_plate_text,
-                        (x_min + x1, y_min + y1 - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.5,
-                        (0, 0, 255),
-                        2,
-                    )
-                    # logging.debug("========================================")
-                except Exception as e:
-                    logging.error(f"Error processing detection: {e}")
+            job = gate_frame(camera, frame)
         except Exception as e:
-            logging.error(f"Error processing region {region['name']}: {e}")
+            logging.error(f"Error gating frame of camera {camera.id}: {e}")
+            job = None
+        metrics.stage_latency.labels("gate").observe(time.perf_counter() - time_start)
+        if job is None:
+            # Nothing to detect, hand the buffer back to the grabber right away
+            metrics.frames_skipped.labels(camera.id).inc()
+            frame.release()
+        else:
+            # Blocks while the pipeline is busy; the grabbers keep only the newest frame
+            pipeline.put(job)
+        processed = True
+
+    if not processed:
+        # Sleep until any of the grabbers delivers a frame
+        frame_ready.wait(timeout=1.0)
 
     # Exit if the stream ends or the user interrupts
     if cv2.waitKey(1) & 0xFF == ord("q"):
         break
 
-input_stream.release()
+# Let the frames in flight finish before the grabbers free their buffers
+pipeline.close()
+for grabber in grabbers:
+    grabber.stop()
+if inference_pool is not None:
+    inference_pool.stop()
+if metrics_server is not None:
+    metrics_server.stop()
+# Unsent messages go to the outbox spill file, if configured
+mqtt_engine.disconnect()
+
+if not cameras:
+    logging.error("Max retries exceeded on all cameras. Exiting...")
+    sys.exit(1)
+if inference_pool is not None and inference_pool.failed:
+    sys.exit(1)
+
 cv2.destroyAllWindows()
@@ -0,0 +1,262 @@
+"""
+Static INT8 quantization of the detector and OCR models.
+
+Calibrates on frames (and optionally plate crops) from a local folder, writes
+<model>.int8.onnx next to every FP32 model and reports latency and agreement
+with the FP32 model: box IoU for the detector, plate-text match rate for OCR.
+Set `engine.onnxruntime.use_quantized: true` to run the quantized models.
+Needs the onnx and sympy packages, which the engine itself does not.
+
+Usage:
+    python quantize.py --frames data/frames [--plates data/plates]
+"""
+
+import argparse
+import glob
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+from onnxruntime.quantization import (
+    CalibrationDataReader,
+    CalibrationMethod,
+    QuantFormat,
+    QuantType,
+    quantize_static,
+)
+from onnxruntime.quantization.shape_inference import quant_pre_process
+
+from engine.pipes.number_plate_text_readers.base.ocr import Ocr
+from engine.pipes.object_detectors.base.lp import LicensePlateDetector
+from engine.tools.detection_tools import box_iou_matrix, to_pixel_boxes
+from engine.tools.onnx_tools import model_session_config, quantized_model_path
+from engine.utils import load_config
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+CALIBRATION_METHODS = {
+    "minmax": CalibrationMethod.MinMax,
+    "entropy": CalibrationMethod.Entropy,
+    "percentile": CalibrationMethod.Percentile,
+}
+
+
+class InputDataReader(CalibrationDataReader):
+    """Feeds preprocessed model inputs to the calibrator, one batch at a time."""
+
+    def __init__(self, input_name, inputs):
+        self.input_name = input_name
+        self._inputs = iter(inputs)
+
+    def get_next(self):
+        x = next(self._inputs, None)
+        return None if x is None else {self.input_name: x}
+
+
+def read_images(folder, limit):
+    paths = sorted(
+        path
+        for path in glob.glob(os.path.join(folder, "*"))
+        if path.lower().endswith(IMAGE_EXTENSIONS)
+    )[:limit]
+    images = [cv2.imread(path) for path in paths]
+    images = [img for img in images if img is not None]
+    if not images:
+        raise FileNotFoundError(f"No images found in {folder}")
+    return images
+
+
+def quantize_model(model_path, reader, args):
+    """Quantize `model_path` with calibration data from `reader`, return the output path."""
+    output_path = quantized_model_path(model_path)
+    with tempfile.TemporaryDirectory() as tmp:
+        # Shape inference and graph cleanup give the quantizer complete type info
+        prepared_path = os.path.join(tmp, "prepared.onnx")
+        quant_pre_process(model_path, prepared_path)
+        quantize_static(
+            prepared_path,
+            output_path,
+            reader,
+            quant_format=(
+                QuantFormat.QDQ if args.format == "qdq" else QuantFormat.QOperator
+            ),
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=args.per_channel,
+            calibrate_method=CALIBRATION_METHODS[args.calibration],
+            nodes_to_exclude=args.exclude_nodes,
+        )
+    return output_path
+
+
+def timed(fn, *args):
+    time_start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - time_start
+
+
+def report_latency(name, fp32_times, int8_times):
+    fp32_ms = np.median(fp32_times) * 1000
+    int8_ms = np.median(int8_times) * 1000
+    print(
+        f"{name}: FP32 {fp32_ms:.2f} ms, INT8 {int8_ms:.2f} ms (median),"
+        f" speedup {fp32_ms / int8_ms:.2f}x"
+    )
+
+
+def evaluate_detector(fp32, int8, frames):
+    fp32_times, int8_times, ious = [], [], []
+    fp32_count = int8_count = 0
+    for frame in frames:
+        # preprocess_batch returns a reused buffer, so copy before the second run
+        xs = fp32.preprocess_batch([frame]).copy()
+        expected, elapsed = timed(fp32.predict_batch, xs)
+        fp32_times.append(elapsed)
+        actual, elapsed = timed(int8.predict_batch, xs)
+        int8_times.append(elapsed)
+
+        fp32_count += len(expected)
+        int8_count += len(actual)
+        if not len(expected):
+            continue
+        fields = ["left", "top", "right", "bottom"]
+        expected_boxes = np.stack([expected[f] for f in fields], axis=1)
+        actual_boxes = np.stack([actual[f] for f in fields], axis=1)
+        if len(actual):
+            # Best matching INT8 box for every FP32 box
+            ious.extend(box_iou_matrix(expected_boxes, actual_boxes).max(axis=1))
+        else:
+            ious.extend([0.0] * len(expected))
+
+    report_latency("Detector", fp32_times, int8_times)
+    ious = np.asarray(ious)
+    if len(ious):
+        print(
+            f"Detector: {fp32_count} FP32 / {int8_count} INT8 boxes,"
+            f" mean IoU {ious.mean():.3f}, matched at IoU>=0.5 {np.mean(ious >= 0.5):.1%}"
+        )
+    else:
+        print("Detector: no FP32 detections to compare against")
+
+
+def evaluate_ocr(fp32, int8, plates):
+    fp32_times, int8_times, matches = [], [], []
+    for plate in plates:
+        xs = fp32.preprocess_crops(
+            plate, [(0, 0, plate.shape[1], plate.shape[0])]
+        ).copy()
+        expected, elapsed = timed(fp32.predict, xs)
+        fp32_times.append(elapsed)
+        actual, elapsed = timed(int8.predict, xs)
+        int8_times.append(elapsed)
+        matches.append(expected == actual)
+
+    report_latency("OCR", fp32_times, int8_times)
+    print(
+        f"OCR: plate-text match rate {np.mean(matches):.1%} over {len(matches)} plates"
+    )
+
+
+def crop_plates(net, frames):
+    """Plate crops found by the FP32 detector, for when no crop folder is given."""
+    plates = []
+    for frame in frames:
+        detections = net.predict_batch(net.preprocess_batch([frame]))
+        for x_min, y_min, x_max, y_max in to_pixel_boxes(
+            detections, (frame.shape[1], frame.shape[0])
+        ).tolist():
+            if x_max > x_min and y_max > y_min:
+                plates.append(frame[y_min:y_max, x_min:x_max])
+    return plates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--frames", required=True, help="Folder with camera frames")
+    parser.add_argument(
+        "--plates",
+        help="Folder with plate crops for OCR calibration. "
+        "Defaults to plates the FP32 detector finds in the frames",
+    )
+    parser.add_argument("--max-images", type=int, default=200)
+    parser.add_argument(
+        "--models", nargs="+", choices=["detector", "ocr"], default=["detector", "ocr"]
+    )
+    parser.add_argument("--format", choices=["qdq", "qoperator"], default="qdq")
+    parser.add_argument(
+        "--calibration", choices=list(CALIBRATION_METHODS), default="minmax"
+    )
+    parser.add_argument("--per-channel", action="store_true")
+    parser.add_argument(
+        "--exclude-nodes",
+        nargs="*",
+        default=[],
+        help="Nodes kept in FP32, e.g. the box decoder",
+    )
+    args = parser.parse_args()
+
+    engine_config = load_config(args.config)["engine"]
+    onnxruntime_config = engine_config.get("onnxruntime")
+
+    def session_config(model):
+        # Plain FP32 model, without touching the optimized graph cache
+        config = model_session_config(onnxruntime_config, model)
+        config.pop("use_quantized", None)
+        config.pop("optimized_model_filepath", None)
+        return config
+
+    def int8_session_config(model):
+        return dict(session_config(model), use_quantized=True)
+
+    frames = read_images(args.frames, args.max_images)
+    print(f"Loaded {len(frames)} frames from {args.frames}")
+
+    net = LicensePlateDetector(engine_config)
+    net.load_model(engine_config["model"], session_config("detector"))
+
+    if "detector" in args.models:
+        reader = InputDataReader(
+            net.input_name, (net.preprocess_batch([frame]).copy() for frame in frames)
+        )
+        output_path = quantize_model(engine_config["model"], reader, args)
+        print(f"Detector: wrote {output_path}")
+
+        net_int8 = LicensePlateDetector(engine_config)
+        net_int8.load_model(engine_config["model"], int8_session_config("detector"))
+        evaluate_detector(net, net_int8, frames)
+
+    if "ocr" in args.models:
+        if args.plates:
+            plates = read_images(args.plates, args.max_images)
+        else:
+            plates = crop_plates(net, frames)[: args.max_images]
+        if not plates:
+            raise RuntimeError("No plates for OCR calibration, pass --plates")
+        print(f"OCR: calibrating on {len(plates)} plates")
+
+        ocr = Ocr()
+        ocr.init_label_converter()
+        ocr.load_model(engine_config["ocr_model"], session_config("ocr"))
+        reader = InputDataReader(
+            ocr.input_name,
+            (
+                ocr.preprocess_crops(
+                    plate, [(0, 0, plate.shape[1], plate.shape[0])]
+                ).copy()
+                for plate in plates
+            ),
+        )
+        output_path = quantize_model(engine_config["ocr_model"], reader, args)
+        print(f"OCR: wrote {output_path}")
+
+        ocr_int8 = Ocr()
+        ocr_int8.init_label_converter()
+        ocr_int8.load_model(engine_config["ocr_model"], int8_session_config("ocr"))
+        evaluate_ocr(ocr, ocr_int8, plates)
+
+
+if __name__ == "__main__":
+    main()
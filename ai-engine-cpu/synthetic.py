@@ -0,0 +1,215 @@
+"""
+Synthetic license-plate data for offline benchmarks and regression tests.
+
+Renders plate crops, full frames with one plate in every region of the first
+configured camera, or a video of plates driving through the regions, each
+with a JSON file of the plate texts and (x1, y1, x2, y2) pixel boxes. Also
+writes tiny randomly initialized detector and OCR models with the interfaces
+of the real ones, to run the engine and benchmark.py when the real weights
+are not available; their detections and reads are meaningless.
+`evaluate` reports detection recall and exact read accuracy of the configured
+models on rendered scenes.
+
+Writing the models needs the onnx package, which the engine itself does not.
+
+Usage:
+    python synthetic.py plates --output data/synthetic/plates [--count 500]
+    python synthetic.py scenes --output data/synthetic/scenes [--count 100]
+    python synthetic.py video --output data/synthetic/passes.mp4 [--frames 500]
+    python synthetic.py models --output data/synthetic/models
+    python synthetic.py evaluate --scenes data/synthetic/scenes
+"""
+
+import argparse
+import json
+import os
+
+import cv2
+import numpy as np
+
+from engine.camera import Camera
+from engine.pipes.number_plate_text_readers.base.ocr import Ocr
+from engine.pipes.object_detectors.base.lp import LicensePlateDetector
+from engine.tools.detection_tools import box_iou_matrix, to_pixel_boxes
+from engine.tools.onnx_tools import model_session_config
+from engine.tools.synthetic import (
+    camera_regions,
+    random_plate_text,
+    render_passes,
+    render_plate,
+    render_scene,
+    write_tiny_detector,
+    write_tiny_ocr,
+)
+from engine.utils import load_config
+
+GROUND_TRUTH = "ground_truth.json"
+
+
+def frame_size(camera_config):
+    size = camera_config["image_size"]
+    return size["width"], size["height"]
+
+
+def write_json(path, data):
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+    print(f"Wrote {path}")
+
+
+def write_plates(args, config, rng):
+    os.makedirs(args.output, exist_ok=True)
+    labels = {}
+    for index in range(args.count):
+        text = random_plate_text(rng)
+        name = f"{index:05d}_{text}.png"
+        cv2.imwrite(os.path.join(args.output, name), render_plate(text, rng))
+        labels[name] = text
+    write_json(os.path.join(args.output, GROUND_TRUTH), labels)
+
+
+def write_scenes(args, config, rng):
+    os.makedirs(args.output, exist_ok=True)
+    camera_config = config["camera"][0]
+    regions = camera_regions(camera_config)
+    width, height = frame_size(camera_config)
+    truth = {}
+    for index in range(args.count):
+        frame, plates = render_scene(regions, rng, width, height)
+        name = f"{index:05d}.png"
+        cv2.imwrite(os.path.join(args.output, name), frame)
+        truth[name] = plates
+    write_json(os.path.join(args.output, GROUND_TRUTH), truth)
+
+
+def write_video(args, config, rng):
+    camera_config = config["camera"][0]
+    regions = camera_regions(camera_config)
+    width, height = frame_size(camera_config)
+    writer = cv2.VideoWriter(
+        args.output, cv2.VideoWriter_fourcc(*"mp4v"), args.fps, (width, height)
+    )
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not open {args.output} for writing")
+    truth = []
+    try:
+        for frame, plates in render_passes(
+            regions, rng, args.frames, width, height, args.frames_per_pass
+        ):
+            writer.write(frame)
+            truth.append(plates)
+    finally:
+        writer.release()
+    print(f"Wrote {args.output}")
+    write_json(os.path.splitext(args.output)[0] + ".json", truth)
+
+
+def write_models(args, config, rng):
+    os.makedirs(args.output, exist_ok=True)
+    for name, write in (
+        ("model-detect.onnx", write_tiny_detector),
+        ("model-ocr.onnx", write_tiny_ocr),
+    ):
+        path = os.path.join(args.output, name)
+        write(path, rng)
+        print(f"Wrote {path}")
+
+
+def evaluate(args, config, rng):
+    """Detection recall at IoU >= --iou and exact read accuracy of the detected plates."""
+    engine_config = config["engine"]
+    onnxruntime_config = engine_config.get("onnxruntime")
+    net = LicensePlateDetector(engine_config)
+    net.load_model(
+        engine_config["model"], model_session_config(onnxruntime_config, "detector")
+    )
+    ocr = Ocr()
+    ocr.init_label_converter()
+    ocr.load_model(
+        engine_config["ocr_model"], model_session_config(onnxruntime_config, "ocr")
+    )
+
+    with open(os.path.join(args.scenes, GROUND_TRUTH)) as f:
+        truth = json.load(f)
+    camera = Camera(config["camera"][0], None)
+    plates = detected = correct = false_positives = 0
+    for name, expected in truth.items():
+        frame = cv2.imread(os.path.join(args.scenes, name))
+        camera.update_resolution(frame.shape[1], frame.shape[0])
+        detections = net.detect(
+            [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in camera.region_rects]
+        )
+        boxes = to_pixel_boxes(detections, camera.region_sizes) + np.tile(
+            camera.region_origins[detections["region"]], 2
+        )
+        plates += len(expected)
+        if not len(expected) or not len(boxes):
+            false_positives += len(boxes)
+            continue
+
+        iou = box_iou_matrix(
+            np.array([plate["box"] for plate in expected], dtype=np.float32),
+            boxes.astype(np.float32),
+        )
+        # Best detection of every plate, each detection used once
+        matches = []
+        used = set()
+        for index in np.argsort(-iou.max(axis=1)):
+            best = int(iou[index].argmax())
+            if iou[index, best] >= args.iou and best not in used:
+                used.add(best)
+                matches.append((index, best))
+        detected += len(matches)
+        false_positives += len(boxes) - len(matches)
+        if matches:
+            texts, _, _ = ocr.read(frame, boxes[[best for _, best in matches]].tolist())
+            correct += sum(
+                text == expected[index]["text"]
+                for (index, _), text in zip(matches, texts)
+            )
+
+    print(f"scenes:          {len(truth)}")
+    print(f"plates:          {plates}")
+    print(f"detected:        {detected} ({detected / max(plates, 1):.1%})")
+    print(f"read correctly:  {correct} ({correct / max(plates, 1):.1%})")
+    print(f"false positives: {false_positives}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--seed", type=int, default=0)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("plates", help="Plate crops")
+    command.add_argument("--output", required=True, help="Folder")
+    command.add_argument("--count", type=int, default=500)
+    command.set_defaults(run=write_plates)
+
+    command = commands.add_parser("scenes", help="Frames with a plate per region")
+    command.add_argument("--output", required=True, help="Folder")
+    command.add_argument("--count", type=int, default=100)
+    command.set_defaults(run=write_scenes)
+
+    command = commands.add_parser("video", help="Plates driving through the regions")
+    command.add_argument("--output", required=True, help="Video file, e.g. .mp4")
+    command.add_argument("--frames", type=int, default=500)
+    command.add_argument("--fps", type=float, default=25)
+    command.add_argument("--frames-per-pass", type=int, default=50)
+    command.set_defaults(run=write_video)
+
+    command = commands.add_parser("models", help="Tiny random stand-in models")
+    command.add_argument("--output", required=True, help="Folder")
+    command.set_defaults(run=write_models)
+
+    command = commands.add_parser("evaluate", help="Accuracy on rendered scenes")
+    command.add_argument("--scenes", required=True, help="Folder written by scenes")
+    command.add_argument("--iou", type=float, default=0.5)
+    command.set_defaults(run=evaluate)
+
+    args = parser.parse_args()
+    args.run(args, load_config(args.config), np.random.default_rng(args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+class Region:
+    """
+    Rectangular region of interest inside a camera frame.
+
+    Args:
+        name (str): Region name, e.g. 'entry_region'.
+        x1, y1 (int): Top-left corner in image_size coordinates.
+        x2, y2 (int): Bottom-right corner in image_size coordinates.
+    """
+
+    __slots__ = ('name', 'x1', 'y1', 'x2', 'y2')
+
+    def __init__(self, name, x1, y1, x2, y2):
+        self.name = name
+        self.x1 = x1
+        self.y1 = y1
+        self.x2 = x2
+        self.y2 = y2
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Build a region from a `camera[].regions[]` config entry.
+
+        The first coordinate is the top-left and the third the bottom-right corner.
+        """
+        coords = config['coordinates']
+        return cls(
+            config['name'], coords[0]['x'], coords[0]['y'], coords[2]['x'], coords[2]['y']
+        )
+
+
+class Camera:
+    """
+    One entry of the `camera:` config list together with its capture worker.
+
+    Args:
+        config (dict): The camera config entry.
+        grabber: Capture worker delivering frames for this camera.
+    """
+
+    def __init__(self, config, grabber):
+        self.config = config
+        self.id = config.get('id')
+        self.width = config['image_size']['width']
+        self.height = config['image_size']['height']
+        self.regions = [Region.from_config(region) for region in config['regions']]
+        self.grabber = grabber
@@ -0,0 +1,183 @@
+import logging
+import threading
+import time
+
+import jetson.utils
+
+
+class Frame:
+    """
+    A captured camera frame handed from the capture thread to the inference loop.
+
+    Attributes:
+        image (np.ndarray): Host copy of the captured cudaImage.
+        seq (int): Monotonic sequence number of the frame within its stream.
+        timestamp (float): time.monotonic() value taken right after capture.
+    """
+
+    __slots__ = ('image', 'seq', 'timestamp')
+
+    def __init__(self, image, seq, timestamp):
+        self.image = image
+        self.seq = seq
+        self.timestamp = timestamp
+
+    @property
+    def age(self):
+        """Seconds elapsed between capturing the frame and now."""
+        return time.monotonic() - self.timestamp
+
+
+class FrameGrabber:
+    """
+    Background capture worker around jetson.utils.videoSource.
+
+    A dedicated thread keeps capturing from the source and only keeps the newest
+    frame, so several cameras can be captured concurrently while a single
+    inference loop consumes them.
+
+    Args:
+        source (str): URI accepted by jetson.utils.videoSource.
+        argv (list): Extra arguments passed to videoSource.
+        name (str): Name used in log messages.
+        max_retries (int): Consecutive reconnect attempts before giving up.
+        retry_delay (float): Delay between reconnect attempts (in seconds).
+        notify (threading.Event, optional): Set whenever a new frame arrives or the
+            worker fails.
+    """
+
+    def __init__(self, source, argv=None, name='camera', max_retries=5, retry_delay=5, notify=None):
+        self.source = source
+        self.argv = argv or []
+        self.name = name
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.notify = notify
+
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.reconnects = 0
+        self.error = None
+
+        self._stream = None
+        self._latest = None
+        self._last_seq = -1
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    @property
+    def failed(self):
+        """True when the worker gave up after exceeding max_retries."""
+        return self.error is not None
+
+    def open(self):
+        """Open the video source."""
+        self._stream = jetson.utils.videoSource(self.source, self.argv)
+
+    def start(self):
+        """
+        Open the source (if needed) and start the capture thread.
+
+        Returns:
+            FrameGrabber: self, for chaining.
+        """
+        if self._stream is None:
+            self.open()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f'capture-{self.name}', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the capture thread and close the video source."""
+        self._running = False
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=self.retry_delay + 1)
+        if self._stream is not None:
+            self._stream.Close()
+            self._stream = None
+
+    def read(self, timeout=None):
+        """
+        Return the newest frame that has not been returned yet.
+
+        Args:
+            timeout (float, optional): Seconds to wait for a new frame. None waits forever.
+
+        Returns:
+            Frame | None: The newest frame, or None on timeout, stop or failure.
+        """
+        with self._condition:
+            if not self._has_new_frame():
+                self._condition.wait_for(
+                    lambda: self._has_new_frame() or not self._running or self.failed,
+                    timeout=timeout)
+            if not self._has_new_frame():
+                return None
+            frame = self._latest
+            self._last_seq = frame.seq
+            return frame
+
+    def is_streaming(self):
+        """True while the capture thread is running and the source has not reached EOS."""
+        return self._running and not self.failed and (self._stream is None or self._stream.IsStreaming())
+
+    def _has_new_frame(self):
+        return self._latest is not None and self._latest.seq > self._last_seq
+
+    def _reconnect(self, retries):
+        self._stream = None
+        if retries > self.max_retries:
+            self.error = ConnectionError(
+                f'Failed to capture frame from stream {self.name} after {retries} attempts')
+            return False
+        time.sleep(self.retry_delay)  # Short delay before the next attempt
+        logging.warning(f'[CAP] Attempting to reconnect to stream {self.name}...')
+        try:
+            self.open()
+            self.reconnects += 1
+        except Exception as e:
+            logging.error(f'[CAP] Could not connect to video source {self.name}: {e}')
+        return True
+
+    def _run(self):
+        seq = 0
+        retries = 0
+        while self._running:
+            img = None
+            try:
+                if self._stream is not None:
+                    img = self._stream.Capture()
+                if img is None:
+                    raise ValueError('Captured image is None')
+                if not isinstance(img, jetson.utils.cudaImage):
+                    raise TypeError('Captured image is not a cudaImage')
+                # videoSource recycles its buffers, keep a host copy of the frame
+                image = jetson.utils.cudaToNumpy(img).copy()
+            except Exception as e:
+                logging.error(f'[CAP] Error capturing from stream {self.name}: {e}')
+                retries += 1
+                if not self._reconnect(retries):
+                    break
+                continue
+            retries = 0  # Reset counter on success
+
+            frame = Frame(image, seq, time.monotonic())
+            seq += 1
+            with self._condition:
+                if self._has_new_frame():
+                    # Previous frame was never consumed
+                    self.frames_dropped += 1
+                self._latest = frame
+                self.frames_captured += 1
+                self._condition.notify_all()
+            if self.notify is not None:
+                self.notify.set()
+
+        with self._condition:
+            self._condition.notify_all()
+        if self.notify is not None:
+            self.notify.set()
@@ -1,15 +1,20 @@
 import paho.mqtt.client as mqtt
+import collections
 import logging
 import time
 import json
+import os
 import ssl
-import sys
+import threading
 
 # Constants for reconnection settings
-FIRST_RECONNECT_DELAY = 1  # Initial delay before the first reconnection attempt (in seconds)
-RECONNECT_RATE = 1  # Rate at which the reconnection delay increases exponentially
-MAX_RECONNECT_COUNT = -1  # Maximum number of reconnection attempts (-1 for infinity)
-MAX_RECONNECT_DELAY = 10  # Maximum delay between reconnection attempts (in seconds)
+FIRST_RECONNECT_DELAY = (
+    1  # Initial delay before the first reconnection attempt (in seconds)
+)
+MAX_RECONNECT_DELAY = 30  # Maximum delay between reconnection attempts (in seconds)
+
+# Messages kept in memory while the broker is away
+OUTBOX_SIZE = 1000
 
 # MQTT Callbacks
 
@@ -34,6 +39,9 @@ def on_disconnect(client, userdata, rc):
     """
     Callback function invoked when the client disconnects from the broker.
 
+    The client's network loop reconnects on its own, waiting from
+    FIRST_RECONNECT_DELAY up to MAX_RECONNECT_DELAY seconds between attempts.
+
     Args:
         client: The client instance for this callback.
         userdata: The private user data as set in Client() or userdata_set().
@@ -43,31 +51,6 @@ def on_disconnect(client, userdata, rc):
         None
     """
     logging.info("Disconnected with result code: {}".format(rc))
-    
-    reconnect_count, reconnect_delay = 0, FIRST_RECONNECT_DELAY
-    if MAX_RECONNECT_COUNT == -1:
-        max_reconnect_attempts = float('inf')  # Infinite attempts
-    else:
-        max_reconnect_attempts = MAX_RECONNECT_COUNT
-    # Attempting reconnection with exponential backoff
-    while reconnect_count < max_reconnect_attempts:
-        logging.info("Reconnecting in {} seconds...".format(reconnect_delay))
-        time.sleep(reconnect_delay)
-
-        try:
-            client.reconnect()
-            logging.info("Reconnected successfully!")
-            return
-        except Exception as err:
-            logging.error("{}. Reconnect failed. Retrying...".format(err))
-
-        # Exponential backoff for reconnection delay
-        reconnect_delay *= RECONNECT_RATE
-        reconnect_delay = min(reconnect_delay, MAX_RECONNECT_DELAY)
-        reconnect_count += 1
-
-    logging.info("Reconnect failed after {} attempts. Exiting...".format(reconnect_count))
-    sys.exit(1)  # Exit the program
 
 
 def on_publish(client, userdata, mid):
@@ -131,12 +114,151 @@ def on_unsubscribe(client, userdata, mid):
     logging.info("Unsubscribed: " + str(mid))
 
 
+class Outbox:
+    """
+    Bounded queue of messages waiting for the broker, oldest first.
+
+    Messages beyond `size` go to the spill file when one is given, and are
+    read back once the messages in memory are sent; without a spill file the
+    oldest message is dropped instead. Messages older than the TTL of their
+    topic are discarded when they come up for sending.
+
+    Args:
+        size (int): Messages kept in memory.
+        spill_file (str, optional): JSON-lines file for the messages beyond `size`.
+        topics (dict, optional): Per-topic settings, {topic: {"ttl": seconds}}.
+
+    Attributes:
+        dropped (int): Messages dropped because the outbox was full.
+        expired (int): Messages discarded because their TTL passed.
+    """
+
+    def __init__(self, size=OUTBOX_SIZE, spill_file=None, topics=None):
+        self.size = size
+        self.spill_file = spill_file or None
+        self.ttls = {
+            topic: settings["ttl"]
+            for topic, settings in (topics or {}).items()
+            if (settings or {}).get("ttl")
+        }
+        self.dropped = 0
+        self.expired = 0
+        self._messages = collections.deque()
+        self._spilled = 0
+        self._lock = threading.Lock()
+
+        # Messages left over from the last run
+        if self.spill_file and os.path.exists(self.spill_file):
+            with open(self.spill_file) as f:
+                self._spilled = sum(1 for _ in f)
+
+    def __len__(self):
+        return len(self._messages) + self._spilled
+
+    def put(self, topic, payload, created=None):
+        """Queue a message; `created` is its wall-clock time, now by default."""
+        message = (time.time() if created is None else created, topic, payload)
+        with self._lock:
+            if len(self._messages) < self.size and not self._spilled:
+                self._messages.append(message)
+            elif self.spill_file:
+                self._spill([message])
+            else:
+                self._messages.popleft()
+                self._messages.append(message)
+                self.dropped += 1
+                logging.warning("MQTT outbox full, dropped the oldest message")
+
+    def put_back(self, *messages):
+        """Return messages taken with get() to the front, in order, e.g. after a failed send."""
+        with self._lock:
+            self._messages.extendleft(reversed(messages))
+
+    def get(self):
+        """Oldest message that has not expired, as (created, topic, payload), or None."""
+        with self._lock:
+            while True:
+                if not self._messages and self._spilled:
+                    self._unspill()
+                if not self._messages:
+                    return None
+                message = self._messages.popleft()
+                created, topic, _ = message
+                ttl = self.ttls.get(topic)
+                if ttl is not None and time.time() - created > ttl:
+                    self.expired += 1
+                    logging.info(f"Discarding a message to {topic}, older than {ttl} s")
+                    continue
+                return message
+
+    def spill_all(self):
+        """Move the messages in memory to the spill file, e.g. before exiting."""
+        if not self.spill_file:
+            return
+        with self._lock:
+            messages = list(self._messages)
+            self._messages.clear()
+            self._spill_front(messages)
+
+    def _spill(self, messages):
+        try:
+            with open(self.spill_file, "a") as f:
+                for message in messages:
+                    f.write(json.dumps(message) + "\n")
+            self._spilled += len(messages)
+        except OSError as e:
+            self.dropped += len(messages)
+            logging.error(f"Writing the MQTT outbox to {self.spill_file} failed: {e}")
+
+    def _unspill(self):
+        # Take up to `size` messages from the spill file, keep the rest there
+        try:
+            with open(self.spill_file) as f:
+                lines = f.readlines()
+            with open(self.spill_file, "w") as f:
+                f.writelines(lines[self.size :])
+        except OSError as e:
+            logging.error(f"Reading the MQTT outbox from {self.spill_file} failed: {e}")
+            self.dropped += self._spilled
+            self._spilled = 0
+            return
+        self._spilled = len(lines[self.size :])
+        for line in lines[: self.size]:
+            try:
+                self._messages.append(tuple(json.loads(line)))
+            except ValueError:
+                self.dropped += 1
+
+    def _spill_front(self, messages):
+        # Memory holds the oldest messages, so they go before the spilled ones
+        try:
+            lines = []
+            if self._spilled:
+                with open(self.spill_file) as f:
+                    lines = f.readlines()
+            with open(self.spill_file, "w") as f:
+                for message in messages:
+                    f.write(json.dumps(message) + "\n")
+                f.writelines(lines)
+            self._spilled += len(messages)
+        except OSError as e:
+            self.dropped += len(messages)
+            logging.error(f"Writing the MQTT outbox to {self.spill_file} failed: {e}")
+
+
 class MQTTEngine:
     """
     Initialize the MQTT Engine.
 
+    Publishing never waits for the broker: messages go out right away while
+    connected and through the outbox otherwise, which is sent in order once
+    the client reconnects. The client's network loop (loop_start or
+    loop_forever) connects and reconnects in the background with backoff.
+
     Args:
-        config (dict): Configuration parameters including broker, port, and client_id.
+        config (dict): Configuration parameters including broker, port, and client_id,
+            and optionally reconnect_delay ({"min", "max"} seconds) and outbox
+            ({"size", "spill_file", "topics": {topic: {"ttl", "qos"}}}).
 
     Returns:
         None
@@ -149,59 +271,202 @@ class MQTTEngine:
         self.tls_ca_cert = config["tls"]["ca"]
         self.tls_certfile = config["tls"]["cert"]
         self.tls_keyfile = config["tls"]["key"]
-        
+
         self.client = mqtt.Client(client_id=self.client_id)
-        
-                # Set TLS configuration if provided
+
+        # Set TLS configuration if provided
         if self.tls_ca_cert and self.tls_certfile and self.tls_keyfile:
-            self.client.tls_set(ca_certs=self.tls_ca_cert, certfile=self.tls_certfile,
-                                 keyfile=self.tls_keyfile, tls_version=ssl.PROTOCOL_TLS)
-            
-        self.client.on_connect = on_connect
-        self.client.on_publish = on_publish
-        self.client.on_disconnect = on_disconnect
+            self.client.tls_set(
+                ca_certs=self.tls_ca_cert,
+                certfile=self.tls_certfile,
+                keyfile=self.tls_keyfile,
+                tls_version=ssl.PROTOCOL_TLS,
+            )
+
+        reconnect_delay = config.get("reconnect_delay") or {}
+        self.client.reconnect_delay_set(
+            min_delay=reconnect_delay.get("min", FIRST_RECONNECT_DELAY),
+            max_delay=reconnect_delay.get("max", MAX_RECONNECT_DELAY),
+        )
+
+        self.client.on_connect = self._on_connect
+        self.client.on_publish = self._on_publish
+        self.client.on_disconnect = self._on_disconnect
         self.client.on_message = on_message
         self.client.on_subscribe = on_subscribe
         self.client.on_unsubscribe = on_unsubscribe
 
+        outbox_config = config.get("outbox") or {}
+        topics = outbox_config.get("topics") or {}
+        self.outbox = Outbox(
+            outbox_config.get("size", OUTBOX_SIZE),
+            outbox_config.get("spill_file"),
+            topics,
+        )
+        # QoS 1 messages also go back to the outbox if the connection drops
+        # before the broker acknowledged them
+        self.qos = {
+            topic: settings["qos"]
+            for topic, settings in topics.items()
+            if (settings or {}).get("qos")
+        }
+
+        self.connected = False
+        # QoS > 0 messages handed to the client and not acknowledged yet, by mid
+        self._unacked = {}
+        # Topics to subscribe to again after every reconnect
+        self.subscriptions = {}
+        # Messages the client refused, e.g. while disconnected
+        self.publish_failures = 0
+        self._flushing = False
+        self._flush_lock = threading.Lock()
+
+    def _on_connect(self, client, userdata, flags, rc):
+        on_connect(client, userdata, flags, rc)
+        if rc != 0:
+            return
+        self.connected = True
+        for topic, qos in list(self.subscriptions.items()):
+            self.client.subscribe(topic, qos=qos)
+        if len(self.outbox):
+            logging.info(f"Sending {len(self.outbox)} queued messages")
+            self.flush()
+
+    def _on_disconnect(self, client, userdata, rc):
+        self.connected = False
+        on_disconnect(client, userdata, rc)
+        self._requeue_unacked()
+
+    def _on_publish(self, client, userdata, mid):
+        on_publish(client, userdata, mid)
+        self._unacked.pop(mid, None)
+
+    def _requeue_unacked(self):
+        """
+        Put the QoS > 0 messages the broker has not acknowledged back at the
+        front of the outbox.
+
+        Called when the connection drops and on disconnect(). The client also
+        resends its own copies after reconnecting, so such a message may
+        arrive twice, which QoS 1 allows. The outbox copy is only sent while
+        within its TTL and, unlike the client's, is spilled on shutdown.
+        """
+        messages = []
+        for mid in list(self._unacked):
+            message = self._unacked.pop(mid, None)
+            if message is not None:
+                messages.append(message)
+        if messages:
+            self.outbox.put_back(*messages)
+            logging.info(f"Requeued {len(messages)} unacknowledged messages")
+
     def connect(self):
         """
-        Connect to the MQTT broker and start the client's event loop.
+        Start connecting to the MQTT broker without waiting for it.
+
+        The connection is made by the client's event loop, which keeps retrying
+        while the broker is unreachable.
 
         Returns:
         None
         """
-        self.client.connect(self.broker, self.port, keepalive=60)
-        #self.client.loop_start()
+        self.client.connect_async(self.broker, self.port, keepalive=60)
+        # self.client.loop_start()
 
     def disconnect(self):
         """
         Disconnect from the MQTT broker and stop the client's event loop.
 
+        Messages still in the outbox are written to its spill file, if any,
+        and sent after the next start.
+
         Returns:
         None
         """
         if self.client:
             self.client.loop_stop()
             self.client.disconnect()
+            self.connected = False
+            self._requeue_unacked()
+        self.outbox.spill_all()
 
     def publish(self, data, topic):
         """
         Publish data to an MQTT topic after encoding it as JSON.
 
+        Never blocks: while the broker is away, or older messages still wait,
+        the message is queued in the outbox.
+
         Args:
             data: The data to be published.
             topic (str): The MQTT topic to publish to.
 
         Returns:
-        None
+        bool: False when the message stays queued for the next connection.
         """
         json_data_str = json.dumps(data)
-        self.client.publish(topic, json_data_str)
+        self.outbox.put(topic, json_data_str)
+        return self.flush()
+
+    def flush(self):
+        """
+        Hand the queued messages to the client, oldest first.
+
+        Only one thread flushes at a time; messages queued meanwhile are sent
+        by that thread. No lock is held while calling the client, whose
+        callbacks may publish themselves.
+
+        Returns:
+        bool: False when disconnected or the client refused a message, which
+        stays queued.
+        """
+        while True:
+            with self._flush_lock:
+                if not self.connected:
+                    return False
+                if self._flushing:
+                    return True
+                self._flushing = True
+            try:
+                while self.connected:
+                    message = self.outbox.get()
+                    if message is None:
+                        break
+                    _, topic, payload = message
+                    qos = self.qos.get(topic, 0)
+                    info = self.client.publish(topic, payload, qos=qos)
+                    if qos and info.rc in (
+                        mqtt.MQTT_ERR_SUCCESS,
+                        mqtt.MQTT_ERR_NO_CONN,
+                    ):
+                        # The client keeps the message, also when not connected
+                        self._unacked[info.mid] = message
+                        if info.rc == mqtt.MQTT_ERR_SUCCESS and info.is_published():
+                            self._unacked.pop(info.mid, None)
+                        if info.rc == mqtt.MQTT_ERR_NO_CONN or not self.connected:
+                            # Disconnected meanwhile: back to the outbox
+                            self._requeue_unacked()
+                            self.publish_failures += 1
+                            return False
+                        continue
+                    if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                        self.outbox.put_back(message)
+                        self.publish_failures += 1
+                        logging.warning(
+                            f"Publishing to {topic} failed: {mqtt.error_string(info.rc)}, "
+                            f"{len(self.outbox)} messages queued"
+                        )
+                        return False
+            finally:
+                with self._flush_lock:
+                    self._flushing = False
+            # Messages queued while this thread finished are not left behind
+            if not len(self.outbox):
+                return self.connected
 
     def subscribe(self, topic, qos=0):
         """
-        Subscribe to an MQTT topic.
+        Subscribe to an MQTT topic, again after every reconnect.
 
         Args:
             topic (str): The MQTT topic to subscribe to.
@@ -210,7 +475,9 @@ class MQTTEngine:
         Returns:
         None
         """
-        self.client.subscribe(topic, qos=qos)
+        self.subscriptions[topic] = qos
+        if self.connected:
+            self.client.subscribe(topic, qos=qos)
 
     def unsubscribe(self, topic):
         """
@@ -222,4 +489,5 @@ class MQTTEngine:
         Returns:
         None
         """
+        self.subscriptions.pop(topic, None)
         self.client.unsubscribe(topic)
@@ -5,7 +5,6 @@ from typing import List, Any, Dict
 import pycuda.driver as cuda
 import tensorrt as trt
 import numpy as np
-import torch
 import os
 
 from engine.tools.image_processing import normalize_img
@@ -122,7 +121,7 @@ class OcrTrt():
         if not len(xs):
             return ([], []) if return_acc else []
         net_out_value = self.run_engine(xs, stream)
-        pred_texts = decode_batch(torch.Tensor(net_out_value), self.label_converter)
+        pred_texts = decode_batch(net_out_value, self.label_converter)
         pred_texts = [pred_text.upper() for pred_text in pred_texts]
         if return_acc:
             if len(net_out_value):
@@ -140,7 +139,7 @@ class OcrTrt():
         return net_out_value
 
     def postprocess(self, net_out_value):
-        pred_texts = decode_batch(torch.Tensor(net_out_value), self.label_converter)
+        pred_texts = decode_batch(net_out_value, self.label_converter)
         pred_texts = [pred_text.upper() for pred_text in pred_texts]
         return pred_texts
     
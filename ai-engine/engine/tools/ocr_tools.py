@@ -1,5 +1,4 @@
 import itertools
-import torch
 import numpy as np
 from numpy import mean
 from PIL import Image, ImageDraw
@@ -30,6 +29,10 @@ class StrLabelConverter(object):
         self.letters = letters
         self.letters_max = len(self.letters) + 1
         self.max_text_len = max_text_len
+        # Upper-case ASCII code of every label, 0 for the CTC blank
+        self.lookup_table = np.frombuffer(
+            b'\0' + self.letters.upper().encode('ascii'), dtype=np.uint8
+        )
 
     def labels_to_text(self, labels: List) -> str:
         out_best = [k for k, g in itertools.groupby(labels)]
@@ -47,6 +50,8 @@ class StrLabelConverter(object):
             torch.IntTensor [length_0 + length_1 + ... length_{n - 1}]: encoded texts.
             torch.IntTensor [n]: length of each text.
         """
+        import torch
+
         length = []
         if isinstance(text, str):
             text = list(map(lambda x: self.letters.index(x) + 1, text))
@@ -69,6 +74,8 @@ class StrLabelConverter(object):
         Returns:
             text (str or list of str): texts to convert.
         """
+        import torch
+
         if length.numel() == 1:
             length = length[0]
             assert t.numel() == length, "text with length: {} does not match declared length: {}".format(t.numel(),
@@ -94,23 +101,67 @@ class StrLabelConverter(object):
         return texts
 
 
-def decode_prediction(logits: torch.Tensor,
+def decode_prediction(logits: np.ndarray,
                       label_converter: StrLabelConverter) -> str:
-    tokens = logits.softmax(2).argmax(2)
-    tokens = tokens.squeeze(1).numpy()
+    return decode_batch(np.asarray(logits), label_converter)[0]
+
+
+def decode_batch(
+    net_out_value: np.ndarray,
+    label_converter: StrLabelConverter,
+    return_confidence: bool = False,
+):
+    """
+    Greedy CTC decoding of a whole batch at once.
 
-    text = label_converter.labels_to_text(tokens)
-    return text
+    Takes the argmax per time step, collapses repeated tokens and removes blanks
+    for all plates in a single set of NumPy operations; the softmax is only
+    computed when confidences are requested.
+
+    Args:
+        net_out_value (np.ndarray): Model output of shape (time steps, batch, classes).
+        label_converter (StrLabelConverter): Converter holding the alphabet.
+        return_confidence (bool): Also return per-character and per-plate confidence.
+
+    Returns:
+        list: Upper-cased plate texts. With return_confidence, a tuple
+        (texts, char_confidences, plate_confidences) where char_confidences is a
+        list of float32 arrays with the probability of every emitted character and
+        plate_confidences a float32 array with the lowest character probability
+        of each plate (0 for empty reads).
+    """
+    logits = np.asarray(net_out_value)
+    tokens = np.argmax(logits, axis=-1).T  # shape: (batch, time steps)
+    batch_size, time_steps = tokens.shape
+
+    # Keep the first token of every run that is not the blank (0)
+    keep = tokens != 0
+    keep[:, 1:] &= tokens[:, 1:] != tokens[:, :-1]
+
+    # Move the kept characters to the front of each row (stable, so order is kept);
+    # the trailing NUL padding is dropped by the fixed-width bytes view
+    order = np.argsort(~keep, axis=1, kind='stable')
+    chars = np.where(keep, label_converter.lookup_table[tokens], 0).astype(np.uint8)
+    chars = np.take_along_axis(chars, order, axis=1)
+    texts = [
+        text.decode('ascii')
+        for text in np.ascontiguousarray(chars).view(f'S{time_steps}').ravel()
+    ]
+    if not return_confidence:
+        return texts
 
+    # Softmax probability of the winning class at every time step:
+    # exp(max) / sum(exp(logits)) == 1 / sum(exp(logits - max))
+    shifted = logits - np.max(logits, axis=-1, keepdims=True)
+    step_probs = (1.0 / np.sum(np.exp(shifted), axis=-1)).T.astype(np.float32)
 
-def decode_batch(net_out_value: torch.Tensor,
-                 label_converter: StrLabelConverter) -> str or List:
-    texts = []
-    for i in range(net_out_value.shape[1]):
-        logits = net_out_value[:, i:i+1, :]
-        pred_texts = decode_prediction(logits, label_converter)
-        texts.append(pred_texts)
-    return texts
+    lengths = keep.sum(axis=1)
+    kept_probs = np.take_along_axis(step_probs, order, axis=1)
+    char_confidences = [kept_probs[i, : lengths[i]] for i in range(batch_size)]
+    plate_confidences = np.where(
+        lengths > 0, np.where(keep, step_probs, np.inf).min(axis=1), 0
+    ).astype(np.float32)
+    return texts, char_confidences, plate_confidences
 
 
 def is_valid_str(s: str, letters: List) -> bool:
@@ -151,6 +202,7 @@ def print_prediction(model,
                      h=50,
                      count_zones=16):
     import matplotlib.pyplot as plt
+    import torch
 
     idx = np.random.randint(len(dataset))
     path = dataset.pathes[idx]
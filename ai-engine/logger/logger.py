@@ -1,48 +1,261 @@
-import logging
-from logging import Handler, LogRecord, Formatter, FileHandler
+import atexit
 import datetime
+import logging
 import os
+import queue
+import sys
+import threading
+import time
+from logging import Filter, Formatter, Handler, LogRecord
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+    RotatingFileHandler,
+    WatchedFileHandler,
+)
+
+
+class FormatterCustom(Formatter):
+    """Formatter noting how many repeats of a message were suppressed before it"""
+
+    def format(self, record: LogRecord) -> str:
+        message = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            message += f" ({suppressed} similar messages suppressed)"
+        return message
+
 
 # create formatter
-FORMATTER = Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+FORMATTER = FormatterCustom("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 
+# Records waiting for the listener thread; when full, new records are dropped
+QUEUE_SIZE = 10000
 
 
-class StdOutHandler(Handler):
-    """Class for standard input and output handler (terminal print)
+class RateLimitFilter(Filter):
     """
-    def emit(self, record: LogRecord) -> None:
-        # Get the logging level from the root logger
-        root_logger = logging.getLogger()
-        logging_level = root_logger.getEffectiveLevel()
-        # Only print messages at or above the logging level set
-        if record.levelno >= logging_level:
-            print(FORMATTER.format(record))
-
-class FileHandlerCustom(FileHandler):
-    """Class for file handler (file)
+    Let through at most `burst` warnings and errors per `interval` seconds from
+    the same line of code; debug and info records always pass.
+
+    The first record after a suppressed stretch carries the number of dropped
+    records in its `suppressed` attribute, see FormatterCustom.
+
+    Args:
+        interval (float): Window in seconds, rate limiting is off when 0.
+        burst (int): Records of one line let through per window.
+    """
+
+    def __init__(self, interval: float = 60.0, burst: int = 5):
+        super().__init__()
+        self.interval = interval
+        self.burst = burst
+        # (path, line) -> [window start, records in window, suppressed]
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: LogRecord) -> bool:
+        if record.levelno < logging.WARNING or not self.interval:
+            return True
+        key = (record.pathname, record.lineno)
+        now = record.created
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window else 0
+                self._windows[key] = [now, 1, 0]
+            elif window[1] < self.burst:
+                window[1] += 1
+                suppressed = window[2]
+                window[2] = 0
+            else:
+                window[2] += 1
+                return False
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class QueueHandlerCustom(QueueHandler):
     """
-    def __init__(self, name):
-        super().__init__(name)
+    Hands records to the listener thread without blocking the caller.
+
+    The message is formatted by the listener, not by the logging thread; log
+    values that may change afterwards as formatted strings.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: LogRecord) -> LogRecord:
+        # Same process: the record does not have to be pickled
+        return record
+
+    def enqueue(self, record: LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RotatingFileHandlerCustom(RotatingFileHandler):
+    """
+    File handler rotating when the file exceeds `max_bytes` or after `interval`
+    seconds, whichever comes first, keeping `backup_count` old files
+    (log.log.1, log.log.2, ...).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_bytes: int = 0,
+        backup_count: int = 0,
+        interval: float = None,
+    ):
+        super().__init__(
+            name, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+        )
+        self.interval = interval
+        self.rollover_at = time.time() + interval if interval else None
+
+    def shouldRollover(self, record: LogRecord) -> bool:
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self) -> None:
+        super().doRollover()
+        if self.interval:
+            self.rollover_at = time.time() + self.interval
+
+
+class FanOutHandler(Handler):
+    """Hands every record to several handlers on the calling thread."""
+
+    def __init__(self, handlers):
+        super().__init__()
+        self.handlers = handlers
 
     def emit(self, record: LogRecord) -> None:
-        # Get the logging level from the root logger
-        root_logger = logging.getLogger()
-        logging_level = root_logger.getEffectiveLevel()
-        # Only write messages at or above the logging level set
-        if record.levelno >= logging_level:
-            record.msg = FORMATTER.format(record)
-            FileHandler.emit(self, record)
-
-def init_logger(logging_level: int = logging.DEBUG,
-                print_to_stdout: bool = True, log_in_file: bool = False, new_file: bool = False):
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+_listener = None
+_queue_handler = None
+# Whether the listener thread runs; QueueListener keeps that private
+_listener_running = False
+
+
+def _start_listener():
+    global _listener_running
+    _listener.start()
+    _listener_running = True
+
+
+def _stop_listener():
+    global _listener_running
+    _listener.stop()
+    _listener_running = False
+
+
+def _log_directly_in_child():
+    """
+    Let a forked child write its records itself, without a listener thread.
+
+    Only the parent's listener thread is resumed after a fork. Writing on the
+    logging thread means a child's records are written before it exits, also
+    through os._exit. The child opens the log file by path and reopens it
+    whenever the parent rotated it, so it never writes into a rotated file;
+    rotating is left to the parent.
+    """
+    global _listener, _queue_handler, _listener_running
+    if _listener is None:
+        return
+    handlers = []
+    for handler in _listener.handlers:
+        if isinstance(handler, RotatingFileHandlerCustom):
+            file_handler = WatchedFileHandler(
+                handler.baseFilename, encoding="utf-8", delay=True
+            )
+            file_handler.setFormatter(handler.formatter)
+            file_handler.setLevel(handler.level)
+            handler = file_handler
+        handlers.append(handler)
+    direct_handler = FanOutHandler(handlers)
+    for log_filter in _queue_handler.filters:
+        if isinstance(log_filter, RateLimitFilter):
+            # A new filter: the parent's lock may have been held at fork time
+            log_filter = RateLimitFilter(log_filter.interval, log_filter.burst)
+        direct_handler.addFilter(log_filter)
+
+    root_logger = logging.getLogger()
+    root_logger.removeHandler(_queue_handler)
+    root_logger.addHandler(direct_handler)
+    _listener = _queue_handler = None
+    _listener_running = False
+
+
+def _pause_for_fork():
+    # Write the queued records and stop the listener thread, so no thread of
+    # this module holds a lock (e.g. of stdout or the log file) at fork time
+    if _listener_running:
+        _stop_listener()
+
+
+def _resume_after_fork():
+    if _listener is not None and not _listener_running:
+        _start_listener()
+
+
+os.register_at_fork(
+    before=_pause_for_fork,
+    after_in_parent=_resume_after_fork,
+    after_in_child=_log_directly_in_child,
+)
+
+
+def stop_logger():
+    """Write the records still queued and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        if _listener_running:
+            _stop_listener()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def init_logger(
+    logging_level: int = logging.DEBUG,
+    print_to_stdout: bool = True,
+    log_in_file: bool = False,
+    new_file: bool = False,
+    max_file_size_mb: float = 10,
+    backup_count: int = 5,
+    rotate_hours: float = 24,
+    rate_limit_seconds: float = 60,
+    rate_limit_burst: int = 5,
+):
     """This function adds custom handlers to the root logger to send logging info.
 
+    Logging calls only put the record on a queue; a listener thread formats it
+    and writes it to the standard output and the log file, so slow disks or
+    terminals never hold up the caller. When the queue is full, records are
+    dropped rather than waited on.
+
     Args:
         logging_level (int, optional): _description_. Defaults to logging.DEBUG.
         print_to_stdout (bool, optional): Set to true if logging is also written to the standard output. Defaults to True.
         log_in_file (bool, optional): Set to true if logging is also written to the file. Defaults to False.
         new_file (bool, optional): Set to true if a new log file should be created on each run. Defaults to False.
+        max_file_size_mb (float, optional): Rotate the log file at this size, 0 to never rotate on size. Defaults to 10.
+        backup_count (int, optional): Rotated log files to keep. Defaults to 5.
+        rotate_hours (float, optional): Rotate the log file after this many hours, 0 to never rotate on time. Defaults to 24.
+        rate_limit_seconds (float, optional): Window of the warning and error rate limit, 0 to turn it off. Defaults to 60.
+        rate_limit_burst (int, optional): Warnings and errors let through per line of code and window. Defaults to 5.
     Examples:
     --------
     >>> import logging
@@ -53,29 +266,30 @@ def init_logger(logging_level: int = logging.DEBUG,
     >>> logging.warning('Write log warning')
     >>> logging.debug('Write log debug')
     """
-    
+    global _listener, _queue_handler
+
     # If no name is provided we will add handlers to the root logger, which is Best practice imho
     root_logger = logging.getLogger()
     root_logger.setLevel(logging_level)
     # Clear handlers before adding new handlers
     root_logger.handlers.clear()
+    stop_logger()
 
+    handlers = []
     # Set up handler for standard output
     if print_to_stdout:
-        standard_handler = StdOutHandler()
-        root_logger.addHandler(standard_handler)
-    
+        standard_handler = logging.StreamHandler(sys.stdout)
+        standard_handler.setFormatter(FORMATTER)
+        handlers.append(standard_handler)
+
     if log_in_file:
-        if not os.path.exists("log/"):
-            os.makedirs("log/")
-        today_date = datetime.datetime.today().strftime('%Y%m%d')
+        today_date = datetime.datetime.today().strftime("%Y%m%d")
         log_folder_path = os.path.join("log", today_date)
-        if not os.path.exists(log_folder_path):
-            os.makedirs(log_folder_path)
-        
-        current_time = datetime.datetime.now().strftime('%H%M%S')
+        os.makedirs(log_folder_path, exist_ok=True)
+
+        current_time = datetime.datetime.now().strftime("%H%M%S")
         log_file_name = f"log.log"  # Log file name with start time
-        
+
         if new_file:
             existing_logs = os.listdir(log_folder_path)
             count = 1
@@ -86,6 +300,25 @@ def init_logger(logging_level: int = logging.DEBUG,
                 log_file_name = f"log_{current_time}_{count}.log"
             else:
                 log_file_name = f"log_{current_time}.log"
-        
-        file_handler = FileHandlerCustom(os.path.join(log_folder_path, log_file_name))
-        root_logger.addHandler(file_handler)
+
+        file_handler = RotatingFileHandlerCustom(
+            os.path.join(log_folder_path, log_file_name),
+            max_bytes=int(max_file_size_mb * 2**20),
+            backup_count=backup_count,
+            interval=rotate_hours * 3600 if rotate_hours else None,
+        )
+        file_handler.setFormatter(FORMATTER)
+        handlers.append(file_handler)
+
+    if not handlers:
+        return
+
+    log_queue = queue.Queue(QUEUE_SIZE)
+    _queue_handler = QueueHandlerCustom(log_queue)
+    _queue_handler.addFilter(RateLimitFilter(rate_limit_seconds, rate_limit_burst))
+    root_logger.addHandler(_queue_handler)
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _start_listener()
+
+
+atexit.register(stop_logger)
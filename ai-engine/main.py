@@ -4,15 +4,16 @@ import jetson.utils
 import argparse
 import sys
 from engine.utils import load_config
-import torch
 import pycuda.driver as cuda
-import time
+import threading
 import logging
 import cv2
 from engine.pipes.number_plate_text_readers.base.ocr_trt import OcrTrt
 
 from logger.logger import init_logger
 from engine.mqtt import MQTTEngine
+from engine.capture import FrameGrabber
+from engine.camera import Camera
 
 try:
     # Load configuration
@@ -34,13 +35,11 @@ log_level = {
 # Initialize logger
 init_logger(logging_level=log_level, 
             print_to_stdout=config['logging']['print_to_stdout'], 
-            log_in_file=config['logging']['log_in_file'])
-
-# Extract camera configuration
-camera_config = config['camera'][0]
-input_image_width = camera_config['image_size']['width']
-input_image_height = camera_config['image_size']['height']
-camera_regions = camera_config['regions']
+            log_in_file=config['logging']['log_in_file'],
+            max_file_size_mb=config['logging'].get('max_file_size_mb', 10),
+            backup_count=config['logging'].get('backup_count', 5),
+            rotate_hours=config['logging'].get('rotate_hours', 24),
+            rate_limit_seconds=config['logging'].get('rate_limit_seconds', 60))
 
 # MQTT configuration
 mqtt_config = {
@@ -55,14 +54,17 @@ mqtt_config = {
         'ca': config['mqtt']['tls']['ca'],
         'cert': config['mqtt']['tls']['cert'],
         'key': config['mqtt']['tls']['key']
-    }
+    },
+    'reconnect_delay': config['mqtt'].get('reconnect_delay'),
+    'outbox': config['mqtt'].get('outbox')
 }
 mqtt_engine = MQTTEngine(mqtt_config)
 mqtt_engine.client.tls_insecure_set(True)
 mqtt_engine.connect()
 mqtt_engine.client.loop_start()
     
-logging.debug(torch.cuda.is_available())
+cuda.init()
+logging.debug("CUDA device: {}".format(cuda.Device(0).name()))
 ctx = cuda.Device(0).make_context()
 stream = cuda.Stream()
 
@@ -93,92 +95,36 @@ net = jetson.inference.detectNet(
     config['engine']['threshold']
     )
 
-# Create video sources & outputs
-is_headless = ["--headless"] if config['engine']['headless'] else []
-try:
-    input_stream = jetson.utils.videoSource(config['camera'][0]['input_stream'], argv)
-except Exception as e:
-    logging.error(f"Could not connect to video source: {e}")
-    sys.exit(1)
-# Check if output_stream is specified
-output_stream = None
-if camera_config.get('output_stream'):
-    output_stream = jetson.utils.videoOutput(camera_config['output_stream'], argv=argv + is_headless)
-
-
 # Max retries configuration
 max_retries = config['engine'].get('max_retries', 5)  # Default to 5 retries if not specified in the config
 
-# Initialize retry counter
-retry_counter = 0
 
-# process frames until the user exits
-while True:
-    try:
-        # capture the next image
-        img = input_stream.Capture()
-        if img is None:
-            logging.error("Captured image is None")
-            raise ValueError("Captured image is None")
-        
-        logging.debug(f"Captured image type: {type(img)}")
-        logging.debug(f"Captured image attributes: {dir(img)}")
-        
-        if not isinstance(img, jetson.utils.cudaImage):
-            logging.error("Captured image is not a cudaImage")
-            raise TypeError("Captured image is not a cudaImage")
-        
-        raw_img = jetson.utils.cudaToNumpy(img)
-        raw_img = cv2.resize(raw_img, (input_image_width, input_image_height))
-        retry_counter = 0  # Reset counter on success
-    except ValueError as e:
-        logging.warning("Attempting to reconnect to RTSP stream...")
-        input_stream = jetson.utils.videoSource(config['camera'][0]['input_stream'], argv)
-        retry_counter += 1
-        if retry_counter > max_retries:
-            mqtt_message = {
-                "error": "Max retries exceeded",
-                "message": f"Error capturing and processing image: {e}",
-            }
-            mqtt_engine.publish(mqtt_message, "alpr/ai-engine/error")
-            # Send your MQTT message or handle the error accordingly
-            logging.error("Max retries exceeded. Exiting...")
-            sys.exit(1)
-        time.sleep(5)  # Short delay before the next attempt
-        continue
-    except Exception as e:
-        logging.error(f"Unexpected error: {e}")
-        retry_counter += 1
-        if retry_counter > max_retries:
-            mqtt_message = {
-                "error": "Max retries exceeded",
-                "message": f"Unexpected error capturing and processing image: {e}",
-            }
-            mqtt_engine.publish(mqtt_message, "alpr/ai-engine/error")
-            logging.error("Max retries exceeded. Exiting...")
-            sys.exit(1)
-        time.sleep(5)  # Short delay before the next attempt
-        continue
+def process_frame(camera, frame):
+    """
+    Run detection and OCR on every region of a camera frame, publish the plates
+    and render the annotated frame to the camera's output stream.
+
+    Args:
+        camera (Camera): Camera the frame was captured from.
+        frame (Frame): Frame returned by the camera's grabber.
+    """
+    raw_img = cv2.resize(frame.image, (camera.width, camera.height))
 
     # Extract regions based on the configuration
-    for region in camera_regions:
+    for region in camera.regions:
         try:
-            name = region['name']
-            coords = region['coordinates']
-            
-            # Extract the top-left and bottom-right coordinates
-            x1, y1 = coords[0]['x'], coords[0]['y']
-            x2, y2 = coords[2]['x'], coords[2]['y']
-            
+            name = region.name
+            x1, y1 = region.x1, region.y1
+
             # Crop the region from the resized image
-            region_img = raw_img[y1:y2, x1:x2, :]
-            
+            region_img = raw_img[region.y1:region.y2, region.x1:region.x2, :]
+
             img = jetson.utils.cudaFromNumpy(region_img)
             # detect objects in the image (with overlay)
             detections = net.Detect(img, overlay=config['engine'].get('overlay', "box,labels,conf"))
 
             # print the detections
-            logging.debug("[DET] Detected {:d} objects in region {}".format(len(detections), name))
+            logging.debug("[DET] Detected %d objects in region %s of camera %s", len(detections), name, camera.id)
 
             for i, detection in enumerate(detections):
                 try:
@@ -197,10 +143,12 @@ while True:
                     #logging.debug("[OCR] Predicting.")
                     license_plate_text = ocr.predict(xs, stream)[0]
                     ctx.pop()
-                    logging.debug("[OCR] Predicted: {}".format(license_plate_text))
-                    
+                    logging.debug("[OCR] Predicted: %s", license_plate_text)
+
                     data = {}
                     data["licensePlate"] = license_plate_text
+                    data["cameraId"] = camera.id
+                    data["region"] = name
                     mqtt_engine.publish(data, "alpr/ramp/req")
                     # Draw the detection and text on the full-sized raw_img
                     cv2.rectangle(raw_img, (x_min + x1, y_min + y1), (x_max + x1, y_max + y1), (0, 255, 0), 2)
@@ -209,23 +157,78 @@ while True:
                 except Exception as e:
                     logging.error(f"Error processing detection: {e}")
         except Exception as e:
-            logging.error(f"Error processing region {region['name']}: {e}")
+            logging.error(f"Error processing region {region.name}: {e}")
 
     try:
         # render the image if output_stream is defined
-        if output_stream:
+        if camera.output_stream:
             img = jetson.utils.cudaFromNumpy(raw_img)
-            output_stream.Render(img)
+            camera.output_stream.Render(img)
 
             # update the title bar
-            output_stream.SetStatus("{:s} | Network {:.0f} FPS".format(config['engine']['network'], net.GetNetworkFPS()))
+            camera.output_stream.SetStatus("{:s} | Network {:.0f} FPS".format(config['engine']['network'], net.GetNetworkFPS()))
 
             # print out performance info
-            logging.debug("Network {:.0f} FPS".format(net.GetNetworkFPS()))
+            logging.debug("Network %.0f FPS", net.GetNetworkFPS())
             logging.debug("========================================")
     except Exception as e:
         logging.error(f"Error rendering image: {e}")
 
-    # exit on input/output EOS
-    if not input_stream.IsStreaming() or (output_stream and not output_stream.IsStreaming()):
-       break
+
+# Create video sources & outputs, one capture worker per camera sharing the networks above
+is_headless = ["--headless"] if config['engine']['headless'] else []
+frame_ready = threading.Event()
+exit_code = 0
+cameras = []
+for camera_config in config['camera']:
+    try:
+        grabber = FrameGrabber(camera_config['input_stream'], argv,
+                               name=str(camera_config.get('id', len(cameras))),
+                               max_retries=max_retries,
+                               notify=frame_ready)
+        grabber.start()
+    except Exception as e:
+        logging.error(f"Could not connect to video source: {e}")
+        sys.exit(1)
+    camera = Camera(camera_config, grabber)
+    # Check if output_stream is specified
+    camera.output_stream = None
+    if camera_config.get('output_stream'):
+        camera.output_stream = jetson.utils.videoOutput(camera_config['output_stream'], argv=argv + is_headless)
+    cameras.append(camera)
+
+# process frames until the user exits
+while cameras:
+    frame_ready.clear()
+    processed = False
+    for camera in list(cameras):
+        frame = camera.grabber.read(timeout=0)
+        if frame is None:
+            if camera.grabber.failed:
+                mqtt_message = {
+                    "error": "Max retries exceeded",
+                    "message": f"Error capturing and processing image: {camera.grabber.error}",
+                    "cameraId": camera.id,
+                }
+                mqtt_engine.publish(mqtt_message, "alpr/ai-engine/error")
+                logging.error(f"Max retries exceeded on camera {camera.id}.")
+                exit_code = 1
+                camera.grabber.stop()
+                cameras.remove(camera)
+            continue
+
+        process_frame(camera, frame)
+        processed = True
+
+        # drop cameras on input/output EOS
+        if not camera.grabber.is_streaming() or (camera.output_stream and not camera.output_stream.IsStreaming()):
+            camera.grabber.stop()
+            cameras.remove(camera)
+
+    if not processed:
+        # Sleep until any of the grabbers delivers a frame
+        frame_ready.wait(timeout=1.0)
+
+# Unsent messages go to the outbox spill file, if configured
+mqtt_engine.disconnect()
+sys.exit(exit_code)
@@ -87,6 +87,8 @@ class RampController:
                     "cert": self.config["mqtt"]["tls"]["cert"],
                     "key": self.config["mqtt"]["tls"]["key"],
                 },
+                "reconnect_delay": self.config["mqtt"].get("reconnect_delay"),
+                "outbox": self.config["mqtt"].get("outbox"),
             }
             self.mqtt_engine = MQTTEngine(mqtt_config)
             self.mqtt_engine.client.tls_insecure_set(
@@ -221,7 +223,8 @@ class RampController:
         Start the MQTT client's loop to listen for messages.
         """
         try:
-            self.mqtt_engine.client.loop_forever()
+            # Keeps retrying while the broker is unreachable, also at start
+            self.mqtt_engine.client.loop_forever(retry_first_connection=True)
         except KeyboardInterrupt:
             logging.error("Keyboard interrupt detected, exiting...")
         finally:
@@ -255,6 +258,10 @@ if __name__ == "__main__":
             logging_level=log_level,
             print_to_stdout=config["logging"]["print_to_stdout"],
             log_in_file=config["logging"]["log_in_file"],
+            max_file_size_mb=config["logging"].get("max_file_size_mb", 10),
+            backup_count=config["logging"].get("backup_count", 5),
+            rotate_hours=config["logging"].get("rotate_hours", 24),
+            rate_limit_seconds=config["logging"].get("rate_limit_seconds", 60),
         )
 
         # Create RampController instance